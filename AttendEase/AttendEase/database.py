@@ -0,0 +1,93 @@
+"""
+Database configuration read from the environment.
+
+ATTENDEASE_DB selects the backend:
+
+* ``sqlite`` (default): ``db.sqlite3`` next to manage.py, or ATTENDEASE_SQLITE_PATH.
+  The pragmas in ``sqlite_pragmas()`` (settings.SQLITE_PRAGMAS) are applied
+  to every new connection by ``tune_sqlite``. WAL mode is stored in the file
+  itself; the development database is committed in WAL mode so connecting
+  does not rewrite it, and its -wal/-shm files are git-ignored.
+* ``postgres``: POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST
+  and POSTGRES_PORT. Connections are kept for ATTENDEASE_DB_CONN_MAX_AGE
+  seconds (default 60) and health-checked before reuse. Set
+  ATTENDEASE_DB_POOL=1 to use psycopg's connection pool instead
+  (ATTENDEASE_DB_POOL_MIN / ATTENDEASE_DB_POOL_MAX); needs ``psycopg[pool]``.
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def _int(environ, name, default):
+    try:
+        return int(environ.get(name, default))
+    except ValueError:
+        raise ImproperlyConfigured(f"{name} must be an integer")
+
+
+def sqlite_pragmas(environ=os.environ):
+    return {
+        # Readers no longer block the writer and vice versa
+        'journal_mode': 'WAL',
+        # Wait for the write lock instead of failing with "database is locked"
+        'busy_timeout': _int(environ, 'ATTENDEASE_SQLITE_BUSY_TIMEOUT', 20000),
+        # Durable across application crashes; WAL makes the full fsync unnecessary
+        'synchronous': 'NORMAL',
+        'mmap_size': _int(environ, 'ATTENDEASE_SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'foreign_keys': 'ON',
+    }
+
+
+# Connected when the settings import this module, before any connection opens
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def database_settings(base_dir, environ=os.environ):
+    """Return the ``DATABASES['default']`` entry for the environment."""
+    engine = environ.get('ATTENDEASE_DB', 'sqlite')
+
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('ATTENDEASE_SQLITE_PATH', base_dir / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock when the transaction starts, so a
+                # transaction that read first cannot fail upgrading its lock
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': _int(environ, 'ATTENDEASE_SQLITE_BUSY_TIMEOUT', 20000) / 1000,
+            },
+            'TEST': {'NAME': environ.get('ATTENDEASE_TEST_SQLITE_PATH')},
+        }
+
+    if engine == 'postgres':
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('POSTGRES_DB', 'attendease'),
+            'USER': environ.get('POSTGRES_USER', 'attendease'),
+            'PASSWORD': environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': _int(environ, 'ATTENDEASE_DB_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': _int(environ, 'ATTENDEASE_DB_CONNECT_TIMEOUT', 5)},
+        }
+        if environ.get('ATTENDEASE_DB_POOL') == '1':
+            # Django's pool replaces persistent connections
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': _int(environ, 'ATTENDEASE_DB_POOL_MIN', 2),
+                'max_size': _int(environ, 'ATTENDEASE_DB_POOL_MAX', 20),
+            }
+        return config
+
+    raise ImproperlyConfigured(f"ATTENDEASE_DB must be 'sqlite' or 'postgres', not {engine!r}")
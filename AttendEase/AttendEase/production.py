@@ -0,0 +1,61 @@
+"""
+Production settings: DJANGO_SETTINGS_MODULE=AttendEase.production.
+
+Everything in settings.py applies, except:
+
+* DEBUG is off; SECRET_KEY and ALLOWED_HOSTS (comma separated) come from
+  ATTENDEASE_SECRET_KEY and ATTENDEASE_ALLOWED_HOSTS.
+* Templates go through the cached loader and are all compiled when the
+  process starts (see attendance/warmup.py).
+* Static files are served under content-hashed names, so they can be cached
+  forever; run ``manage.py collectstatic`` on every deploy.
+* The cache is shared by every worker process: Redis at ATTENDEASE_REDIS_URL
+  or Memcached at ATTENDEASE_MEMCACHED (comma-separated host:port; needs
+  ``pymemcache``, see requirements.txt). Roles, dashboard fragments, calendar
+  months and class rosters are invalidated through it, which a per-process
+  cache cannot do across workers.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('ATTENDEASE_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Set ATTENDEASE_SECRET_KEY for production")
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('ATTENDEASE_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    # Explicit loaders replace APP_DIRS
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+ATTENDANCE_WARM_TEMPLATES = True
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+REDIS_URL = os.environ.get('ATTENDEASE_REDIS_URL', '')
+MEMCACHED = [host.strip() for host in os.environ.get('ATTENDEASE_MEMCACHED', '').split(',') if host.strip()]
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif MEMCACHED:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': MEMCACHED}}
+else:
+    raise ImproperlyConfigured("Set ATTENDEASE_REDIS_URL or ATTENDEASE_MEMCACHED for a cache shared by all workers")
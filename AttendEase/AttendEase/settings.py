@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_settings, sqlite_pragmas
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'attendance.metrics.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,14 +78,61 @@ WSGI_APPLICATION = 'AttendEase.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Chosen with ATTENDEASE_DB (sqlite or postgres); see AttendEase/database.py.
 
 DATABASES = {
+    'default': database_settings(BASE_DIR),
+}
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = sqlite_pragmas()
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point 'default' at Redis/Memcached in production so
+# every worker process shares the same counters.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'attendease',
     }
 }
 
+# Cache alias and maximum staleness (seconds) of the reporting dashboard counters
+ATTENDANCE_COUNTER_CACHE = 'default'
+ATTENDANCE_COUNTER_TIMEOUT = 300
+
+# Cache alias and lifetime (seconds) of each user's resolved role and groups;
+# the alias must be shared by every process (manage.py check --deploy)
+ATTENDANCE_ROLE_CACHE = 'default'
+ATTENDANCE_ROLE_TIMEOUT = 60
+
+# Cache alias and lifetime (seconds) of rendered dashboard fragments; writes
+# invalidate them through per-entity version counters (attendance/fragments.py)
+ATTENDANCE_FRAGMENT_CACHE = 'default'
+ATTENDANCE_FRAGMENT_TIMEOUT = 3600
+# Lifetime of the version counters; an expired one only costs a cache miss
+ATTENDANCE_VERSION_TIMEOUT = 86400
+
+# Lifetime (seconds) of each process's in-memory class rosters (attendance/rosters.py)
+ATTENDANCE_ROSTER_TIMEOUT = 300
+
+# Cache alias and lifetime (seconds) of the attendance calendar's per-month
+# counts of ended months; writes retire a month through its version counter
+ATTENDANCE_CALENDAR_CACHE = 'default'
+ATTENDANCE_CALENDAR_TIMEOUT = 86400
+
+
+# Request metrics (attendance/metrics.py)
+# Samples kept per process, the default query budget per request and
+# per-URL-name overrides, and the bearer token accepted by /metrics/
+ATTENDANCE_METRICS_BUFFER = 5000
+ATTENDANCE_QUERY_BUDGET = 30
+ATTENDANCE_QUERY_BUDGETS = {}
+ATTENDANCE_METRICS_TOKEN = os.environ.get('ATTENDEASE_METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,6 +169,19 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# Project-wide assets (stylesheet, logo) next to the app's own static files
+STATICFILES_DIRS = [BASE_DIR.parent / 'static']
+# Where collectstatic gathers the files to serve
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Uploaded files (avatars and their thumbnails)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Avatar thumbnails (attendance/avatars.py): edge length in px, and the worker
+# threads that render them per process (0 renders inline, after the commit)
+ATTENDANCE_AVATAR_SIZE = 80
+ATTENDANCE_AVATAR_WORKERS = 2
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
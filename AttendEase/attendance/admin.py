@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, Faculty, Subject, AttendanceRecord
+from .models import Student, Faculty, Subject, AttendanceRecord, AttendanceChange
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -29,4 +29,21 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_display = ('student', 'subject', 'date', 'present')
     list_filter = ('subject', 'date', 'present')
     search_fields = ('student__roll_no', 'subject__course_name')
-    date_hierarchy = 'date'
\ No newline at end of file
+    date_hierarchy = 'date'
+
+@admin.register(AttendanceChange)
+class AttendanceChangeAdmin(admin.ModelAdmin):
+    # The change log is append-only: read it here, never edit it
+    list_display = ('student', 'subject', 'date', 'previous', 'present', 'changed_by', 'changed_at', 'source')
+    list_filter = ('month', 'source')
+    search_fields = ('student__roll_no', 'subject__course_name')
+    list_select_related = ('student', 'subject', 'changed_by')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,235 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .bitmaps import roster_ids
+from .models import AttendanceChange, AttendanceSession, ClassRoster, Defaulter, DefaulterRun, Student, Subject
+
+
+# ========================================= Attendance Analytics =========================================
+# Loads the packed session bitmaps of a set of subjects into one
+# student x subject x date matrix and computes class-wide reports on it with
+# vectorized NumPy operations instead of per-student Python loops.
+
+NOT_ENROLLED = -1
+DEFAULTER_THRESHOLD = 75.0
+
+
+@dataclass
+class PresenceMatrix:
+    student_ids: np.ndarray   # (students,)
+    subject_ids: np.ndarray   # (subjects,)
+    dates: np.ndarray         # (dates,) datetime64[D]
+    marks: np.ndarray         # (students, subjects, dates) int8: 1 present, 0 absent, -1 no session for them
+
+    @property
+    def attended(self):
+        return (self.marks == 1).sum(axis=2)
+
+    @property
+    def delivered(self):
+        return (self.marks != NOT_ENROLLED).sum(axis=2)
+
+    def student_index(self, student_id):
+        position = np.searchsorted(self.student_ids, student_id)
+        if position == len(self.student_ids) or self.student_ids[position] != student_id:
+            return None
+        return int(position)
+
+
+def _percent(attended, delivered):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(delivered > 0, np.round(attended / delivered * 100, 2), 0.0)
+
+
+def load_matrix(subject_ids):
+    """Build the presence matrix for ``subject_ids`` from their sessions (one query for sessions, one for rosters)."""
+    sessions = list(
+        AttendanceSession.objects.filter(subject_id__in=list(subject_ids))
+        .values_list('subject_id', 'date', 'roster_id', 'present')
+    )
+    rosters = {
+        pk: roster_ids(packed)
+        for pk, packed in ClassRoster.objects.filter(pk__in={s[2] for s in sessions}).values_list('pk', 'student_ids')
+    }
+    student_ids = np.unique(np.concatenate(list(rosters.values()))) if rosters else np.array([], dtype=np.int64)
+    subject_axis = np.array(sorted({s[0] for s in sessions}), dtype=np.int64)
+    date_axis = np.array(sorted({s[1] for s in sessions}), dtype='datetime64[D]')
+    marks = np.full((len(student_ids), len(subject_axis), len(date_axis)), NOT_ENROLLED, dtype=np.int8)
+
+    by_roster = defaultdict(list)
+    for subject_id, on_date, roster_id, present in sessions:
+        by_roster[roster_id].append((subject_id, on_date, bytes(present)))
+    for roster_id, rows in by_roster.items():
+        ids = rosters[roster_id]
+        rows_at = np.searchsorted(student_ids, ids)
+        subjects_at = np.searchsorted(subject_axis, [row[0] for row in rows])
+        dates_at = np.searchsorted(date_axis, np.array([row[1] for row in rows], dtype='datetime64[D]'))
+        bitmaps = np.frombuffer(b''.join(row[2] for row in rows), dtype=np.uint8).reshape(len(rows), -1)
+        bits = np.unpackbits(bitmaps, axis=1, count=len(ids))
+        marks[rows_at[:, None], subjects_at[None, :], dates_at[None, :]] = bits.T
+    return PresenceMatrix(student_ids, subject_axis, date_axis, marks)
+
+
+# ------------------------------------------------ Reports ------------------------------------------------
+
+def subject_percentages(matrix):
+    """(students, subjects) attendance percentage of each student in each subject."""
+    return _percent(matrix.attended, matrix.delivered)
+
+
+def overall_percentages(matrix):
+    """(students,) attendance percentage of each student across all subjects."""
+    return _percent(matrix.attended.sum(axis=1), matrix.delivered.sum(axis=1))
+
+
+def rolling_percentages(matrix, window=7):
+    """(students, dates) percentage over the last ``window`` dates up to and including each date."""
+    attended = np.cumsum((matrix.marks == 1).sum(axis=1), axis=1)
+    delivered = np.cumsum((matrix.marks != NOT_ENROLLED).sum(axis=1), axis=1)
+    attended[:, window:] = attended[:, window:] - attended[:, :-window]
+    delivered[:, window:] = delivered[:, window:] - delivered[:, :-window]
+    return _percent(attended, delivered)
+
+
+def subject_averages(matrix):
+    """(subjects,) mean percentage of the students who had at least one session of each subject."""
+    percentages = subject_percentages(matrix)
+    enrolled = matrix.delivered > 0
+    counts = enrolled.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, np.round((percentages * enrolled).sum(axis=0) / counts, 2), 0.0)
+
+
+def defaulters(matrix, threshold=DEFAULTER_THRESHOLD):
+    """Return ``[(student id, overall percent)]`` below ``threshold``, lowest first."""
+    overall = overall_percentages(matrix)
+    below = np.flatnonzero((overall < threshold) & (matrix.delivered.sum(axis=1) > 0))
+    below = below[np.argsort(overall[below], kind='stable')]
+    return list(zip(matrix.student_ids[below].tolist(), overall[below].tolist()))
+
+
+# ------------------------------------------------ Pages ------------------------------------------------
+
+def class_report(class_name, threshold=DEFAULTER_THRESHOLD):
+    """Subject averages and defaulters of one class, ready for the reporting dashboard."""
+    subjects = list(Subject.objects.filter(student_class=class_name).order_by('pk'))
+    matrix = load_matrix([subject.pk for subject in subjects])
+    averages = dict(zip(matrix.subject_ids.tolist(), subject_averages(matrix).tolist()))
+    below = defaulters(matrix, threshold)
+    students = Student.objects.in_bulk([student_id for student_id, _ in below])
+    return {
+        'class_name': class_name,
+        'threshold': threshold,
+        'sessions': int((matrix.marks != NOT_ENROLLED).any(axis=0).sum()),
+        'subjects': [(subject, averages.get(subject.pk)) for subject in subjects],
+        'defaulters': [(students[student_id], percent) for student_id, percent in below if student_id in students],
+    }
+
+
+def student_report(student, subjects, window=7):
+    """Per-subject figures of ``student`` next to the class average, plus their recent rolling trend."""
+    matrix = load_matrix([subject.pk for subject in subjects])
+    position = matrix.student_index(student.pk)
+    averages = dict(zip(matrix.subject_ids.tolist(), subject_averages(matrix).tolist()))
+    columns = dict(zip(matrix.subject_ids.tolist(), range(len(matrix.subject_ids))))
+    attended_matrix, delivered_matrix = matrix.attended, matrix.delivered
+
+    rows = []
+    for subject in subjects:
+        attended = delivered = 0
+        if position is not None and subject.pk in columns:
+            attended = int(attended_matrix[position, columns[subject.pk]])
+            delivered = int(delivered_matrix[position, columns[subject.pk]])
+        rows.append({
+            'subject': subject,
+            'attended': attended,
+            'delivered': delivered,
+            'percent': round(attended / delivered * 100, 2) if delivered else 0,
+            'class_average': averages.get(subject.pk, 0),
+        })
+
+    trend = []
+    if position is not None:
+        held = (matrix.marks[position] != NOT_ENROLLED).any(axis=0)
+        rolling = rolling_percentages(matrix, window)[position]
+        trend = list(zip(matrix.dates[held].tolist(), rolling[held].tolist()))
+    overall = overall_percentages(matrix)[position] if position is not None else 0
+    return {'rows': rows, 'overall': float(overall), 'trend': trend, 'window': window}
+
+
+# ------------------------------------------------ Stored Defaulters ------------------------------------------------
+# `manage.py compute_defaulters` keeps the Defaulter table current. Each run
+# records a high-water mark of AttendanceSession.updated_at; the next run only
+# reloads the subjects whose sessions were written after that mark, one class
+# at a time. updated_at is set before its transaction commits, so the mark
+# stays DEFAULTER_LAG behind the clock: a session written just before a run
+# but committed after it is still newer than the mark on the next run.
+# Deleted marks leave no newer session behind, so their subjects are found in
+# the change log (audit.py) instead, and Defaulter rows of subjects with no
+# sessions left are dropped on every run.
+
+DEFAULTER_BATCH_SIZE = 2000
+DEFAULTER_LAG = timedelta(seconds=30)
+
+
+def _subject_defaulters(matrix, threshold):
+    attended, delivered = matrix.attended, matrix.delivered
+    percentages = _percent(attended, delivered)
+    rows, columns = np.nonzero((delivered > 0) & (percentages < threshold))
+    return [
+        Defaulter(student_id=int(matrix.student_ids[row]), subject_id=int(matrix.subject_ids[column]),
+                  attended=int(attended[row, column]), delivered=int(delivered[row, column]),
+                  percent=float(percentages[row, column]))
+        for row, column in zip(rows.tolist(), columns.tolist())
+    ]
+
+
+def compute_defaulters(threshold=DEFAULTER_THRESHOLD, full=False):
+    """
+    Bring the Defaulter table up to date and return the DefaulterRun. Only
+    subjects with sessions written since the previous run are recomputed,
+    unless ``full`` is set, there was no previous run or the threshold changed.
+    """
+    last = DefaulterRun.objects.order_by('-pk').first()
+    full = full or last is None or last.threshold != threshold
+    # Sessions newer than this are recomputed now and again by the next run
+    high_water = timezone.now() - DEFAULTER_LAG
+
+    sessions = AttendanceSession.objects.all()
+    deleted = AttendanceChange.objects.none()
+    if not full and last.high_water is not None:
+        sessions = sessions.filter(updated_at__gt=last.high_water)
+        deleted = AttendanceChange.objects.filter(
+            month__gte=timezone.localdate(last.high_water).replace(day=1),
+            changed_at__gt=last.high_water, present__isnull=True,
+        )
+    subject_ids = set(sessions.values_list('subject_id', flat=True).distinct())
+    subject_ids |= set(deleted.values_list('subject_id', flat=True).distinct())
+
+    by_class = defaultdict(list)
+    for subject_id, class_name in Subject.objects.filter(pk__in=subject_ids).values_list('pk', 'student_class'):
+        by_class[class_name].append(subject_id)
+
+    with transaction.atomic():
+        if full:
+            stale = Defaulter.objects.all()
+        else:
+            stale = Defaulter.objects.filter(
+                Q(subject_id__in=subject_ids) | ~Q(subject__in=AttendanceSession.objects.values('subject'))
+            )
+        stale.delete()
+        created = 0
+        for class_subject_ids in by_class.values():
+            rows = _subject_defaulters(load_matrix(class_subject_ids), threshold)
+            Defaulter.objects.bulk_create(rows, batch_size=DEFAULTER_BATCH_SIZE)
+            created += len(rows)
+        return DefaulterRun.objects.create(
+            threshold=threshold, full=full, subjects=len(subject_ids), defaulters=created,
+            high_water=high_water,
+        )
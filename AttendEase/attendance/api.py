@@ -0,0 +1,173 @@
+import json
+from datetime import timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_http_methods
+
+from .models import Student, Subject
+from .services import apply_sync_batch, changes_since, decode_cursor, mark_roster, presence_by_student
+
+
+# ========================================= Attendance API =========================================
+# Async JSON endpoints for mobile and tablet clients. A client fetches the
+# roster of a subject once, then PATCHes only the students whose mark changed:
+#
+#   GET   api/subjects/<id>/attendance/?date=2024-08-01
+#         -> {"subject": 1, "date": "2024-08-01",
+#             "students": [[id, roll no, name], ...], "present": [ids], "absent": [ids]}
+#   PATCH api/subjects/<id>/attendance/   {"date": "2024-08-01", "present": [ids], "absent": [ids]}
+#         -> {"created": 2, "updated": 1}
+#
+# Students without a mark for the day are in neither list.
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _date(value):
+    try:
+        return parse_date(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _subjects_of(user):
+    subjects = Subject.objects.all()
+    if not user.is_staff:
+        # Faculty are matched to their login by username (see faculty_dashboard)
+        subjects = subjects.filter(faculty__username=user.username)
+    return subjects
+
+
+async def _subject_for(request, subject_id):
+    """Return the subject if the logged-in user may mark it, else an error response."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, _error("Authentication required", status=401)
+    subject = await _subjects_of(user).filter(pk=subject_id).only('pk', 'student_class').afirst()
+    if subject is None:
+        return None, _error("Subject not found", status=404)
+    return subject, None
+
+
+async def _roster(subject, on_date):
+    students = [
+        [pk, roll_no, f"{first_name} {last_name}".strip()]
+        async for pk, roll_no, first_name, last_name in Student.objects.filter(class_name=subject.student_class)
+        .order_by('roll_no').values_list('pk', 'roll_no', 'first_name', 'last_name')
+    ]
+    presence = await sync_to_async(presence_by_student)(on_date, subject_id=subject.pk)
+    return {
+        'subject': subject.pk,
+        'date': on_date.isoformat(),
+        'students': students,
+        'present': sorted(pk for pk, present in presence.items() if present),
+        'absent': sorted(pk for pk, present in presence.items() if not present),
+    }
+
+
+def _parse_deltas(body):
+    """Return ``(date, {student id: present})`` from a PATCH body, or raise ValueError."""
+    try:
+        payload = json.loads(body)
+        on_date = _date(payload['date'])
+        present, absent = payload.get('present', []), payload.get('absent', [])
+        roster = {int(pk): True for pk in present}
+        roster.update((int(pk), False) for pk in absent)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Expected {\"date\": \"YYYY-MM-DD\", \"present\": [ids], \"absent\": [ids]}")
+    if on_date is None:
+        raise ValueError("Invalid date")
+    if len(roster) != len(present) + len(absent):
+        raise ValueError("A student cannot be both present and absent")
+    return on_date, roster
+
+
+@require_http_methods(['GET', 'PATCH'])
+async def subject_attendance(request, subject_id):
+    subject, error = await _subject_for(request, subject_id)
+    if error:
+        return error
+
+    if request.method == 'GET':
+        on_date = _date(request.GET.get('date', ''))
+        if on_date is None:
+            return _error("Invalid date")
+        return JsonResponse(await _roster(subject, on_date))
+
+    try:
+        on_date, roster = _parse_deltas(request.body)
+    except ValueError as e:
+        return _error(str(e))
+    enrolled = await Student.objects.filter(class_name=subject.student_class, pk__in=list(roster)).acount()
+    if enrolled != len(roster):
+        return _error("Some students are not in this subject's class")
+
+    created, updated = await sync_to_async(mark_roster)(subject.pk, on_date, roster,
+                                                        changed_by=await request.auser(), source='api')
+    return JsonResponse({'created': created, 'updated': updated})
+
+
+# ------------------------------------------------ Offline Sync ------------------------------------------------
+#   POST api/sync/  {"cursor": "18f3a2c4b1e00.2a" | null,
+#                    "operations": [{"key": "<client uuid>", "student": 1, "subject": 2, "date": "2024-08-01",
+#                                    "present": true, "at": "2024-08-01T09:02:11Z"}, ...]}
+#         -> {"results": {"<key>": "applied" | "stale" | "duplicate"},
+#             "changes": [[student, subject, date, present], ...], "cursor": "...", "more": false}
+#
+# Operations are applied in one transaction (see services.apply_sync_batch);
+# "changes" are the marks of the user's subjects written since "cursor".
+
+SYNC_MAX_OPERATIONS = 5000
+
+
+def _parse_operation(raw):
+    key, on_date, marked_at = raw['key'], _date(raw['date']), parse_datetime(raw['at'])
+    if not isinstance(key, str) or not 0 < len(key) <= 64 or on_date is None or marked_at is None \
+            or not isinstance(raw['present'], bool):
+        raise ValueError
+    if timezone.is_naive(marked_at):
+        marked_at = timezone.make_aware(marked_at, dt_timezone.utc)
+    return {'key': key, 'student': int(raw['student']), 'subject': int(raw['subject']), 'date': on_date,
+            'present': raw['present'], 'marked_at': marked_at}
+
+
+@require_http_methods(['POST'])
+async def sync_attendance(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return _error("Authentication required", status=401)
+    try:
+        payload = json.loads(request.body)
+        cursor = payload.get('cursor') or None
+        raw_operations = list(payload.get('operations', []))
+    except (ValueError, TypeError, AttributeError):
+        return _error("Expected {\"cursor\": ..., \"operations\": [...]}")
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except (ValueError, TypeError, AttributeError):
+        return _error("Invalid cursor")
+    try:
+        operations = [_parse_operation(raw) for raw in raw_operations]
+    except (ValueError, TypeError, KeyError):
+        return _error("Each operation needs key, student, subject, date, present and at")
+    if len(operations) > SYNC_MAX_OPERATIONS:
+        return _error(f"At most {SYNC_MAX_OPERATIONS} operations per batch")
+
+    classes = {pk: class_name async for pk, class_name in _subjects_of(user).values_list('pk', 'student_class')}
+    if any(op['subject'] not in classes for op in operations):
+        return _error("Subject not found", status=404)
+    enrolled = {
+        pk: class_name async for pk, class_name in Student.objects.filter(pk__in={op['student'] for op in operations})
+        .values_list('pk', 'class_name')
+    }
+    if any(enrolled.get(op['student']) != classes[op['subject']] for op in operations):
+        return _error("Some students are not in their subject's class")
+
+    results = await sync_to_async(apply_sync_batch)(user, operations) if operations else {}
+    changes, next_cursor, more = await sync_to_async(changes_since)(list(classes), cursor)
+    return JsonResponse({'results': results, 'changes': changes, 'cursor': next_cursor, 'more': more})
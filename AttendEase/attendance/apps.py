@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+
+        if getattr(settings, 'ATTENDANCE_WARM_TEMPLATES', False):
+            from .warmup import warm_templates
+            warm_templates()
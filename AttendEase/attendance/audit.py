@@ -0,0 +1,64 @@
+from datetime import date
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import AttendanceChange
+
+
+# ========================================= Attendance Change Log =========================================
+# Every change to a mark is appended to AttendanceChange: services.mark_roster
+# logs a whole roster with one INSERT, single-row saves and deletes are logged
+# by signals.py. Rows are never updated or deleted. ``month`` (first day of the
+# month the change was made in) partitions the log, so a month can be audited
+# or archived with one index range.
+
+LOGGED_FIELDS = ('student', 'subject', 'date', 'previous', 'present', 'changed_by', 'changed_at', 'month', 'source')
+
+
+def _insert_sql():
+    fields = [AttendanceChange._meta.get_field(name) for name in LOGGED_FIELDS]
+    quote = connection.ops.quote_name
+    return 'INSERT INTO %s (%s) VALUES (%s)' % (
+        quote(AttendanceChange._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+
+
+def _prep(name, value):
+    return AttendanceChange._meta.get_field(name).get_db_prep_save(value, connection)
+
+
+def log_changes(changes, changed_by=None, source=''):
+    """
+    Append ``changes`` — ``(student id, subject id, date, previous, present)``
+    tuples, where ``previous`` is None for a new mark and ``present`` is None
+    for a deleted one — in one INSERT. Returns how many were logged.
+    """
+    now = timezone.now()
+    # Every row of a batch shares these, so convert them for the database once
+    # instead of per row as bulk_create would (most of its cost on a roster)
+    shared = (_prep('changed_by', getattr(changed_by, 'pk', None)), _prep('changed_at', now),
+              _prep('month', timezone.localdate(now).replace(day=1)), _prep('source', source))
+    dates = {}
+
+    rows = []
+    for student_id, subject_id, on_date, previous, present in changes:
+        if on_date not in dates:
+            # Views may pass the date straight from the query string
+            dates[on_date] = _prep('date', date.fromisoformat(on_date) if isinstance(on_date, str) else on_date)
+        rows.append((int(student_id), int(subject_id), dates[on_date], previous, present) + shared)
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(_insert_sql(), rows)
+    return len(rows)
+
+
+def change_history(student_id, subject_id, limit=100):
+    """Return the latest ``limit`` changes to one student's marks in one subject, newest first."""
+    return list(
+        AttendanceChange.objects.filter(student_id=student_id, subject_id=subject_id)
+        .order_by('-changed_at', '-pk')
+        .values('date', 'previous', 'present', 'changed_at', 'source', 'changed_by__username')[:limit]
+    )
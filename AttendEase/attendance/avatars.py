@@ -0,0 +1,124 @@
+import hashlib
+import io
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from . import fragments
+from .models import Faculty, Student
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================= Avatar Thumbnails =========================================
+# Uploaded avatars are kept as-is; a square ATTENDANCE_AVATAR_SIZE px WebP and JPEG
+# copy is rendered off the request path by a small thread pool once the upload
+# is committed (see signals.py). Thumbnails are named after the SHA-256 of the
+# original, so identical uploads share one file and a URL never changes
+# content, which lets views.avatar_thumbnail serve them as immutable.
+# `manage.py build_avatar_thumbnails` renders the ones that are missing.
+
+AVATAR_MODELS = {'student': Student, 'faculty': Faculty}
+# Reporting table that shows each kind's avatars
+AVATAR_TABLES = {'student': 'students', 'faculty': 'faculties'}
+THUMBNAIL_DIR = 'thumbs/avatars'
+THUMBNAIL_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+                     'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True})}
+THUMBNAIL_NAME = re.compile(r'^[0-9a-f]{16}-\d+\.(webp|jpg)$')
+
+
+def thumbnail_size():
+    # Twice the 40px the tables display, for high-density screens
+    return getattr(settings, 'ATTENDANCE_AVATAR_SIZE', 80)
+
+
+def thumbnail_path(name):
+    return f'{THUMBNAIL_DIR}/{name}'
+
+
+def render_thumbnails(data, size):
+    """Return ``{extension: encoded bytes}`` of a ``size`` px square crop of image ``data``."""
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft('RGB', (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    rendered = {}
+    for extension, (fmt, options) in THUMBNAIL_FORMATS.items():
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **options)
+        rendered[extension] = buffer.getvalue()
+    return rendered
+
+
+def process_avatar(kind, pk, name):
+    """Render the thumbnails of ``name`` and point the profile at them, if it still uses that avatar."""
+    try:
+        with default_storage.open(name, 'rb') as original:
+            data = original.read()
+    except OSError:
+        logger.warning("Avatar %s of %s %s is missing", name, kind, pk)
+        return None
+
+    size = thumbnail_size()
+    stem = f'{hashlib.sha256(data).hexdigest()[:16]}-{size}'
+    missing = [ext for ext in THUMBNAIL_FORMATS if not default_storage.exists(thumbnail_path(f'{stem}.{ext}'))]
+    if missing:
+        try:
+            rendered = render_thumbnails(data, size)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning("Could not read avatar %s of %s %s: %s", name, kind, pk, e)
+            return None
+        for ext in missing:
+            default_storage.save(thumbnail_path(f'{stem}.{ext}'), ContentFile(rendered[ext]))
+
+    # A newer upload may have replaced the avatar while this one was rendered
+    if AVATAR_MODELS[kind].objects.filter(pk=pk, avatar=name).update(avatar_thumb=stem):
+        fragments.bump(('table', AVATAR_TABLES[kind]))
+    return stem
+
+
+# ------------------------------------------------ Worker Pool ------------------------------------------------
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ATTENDANCE_AVATAR_WORKERS', 2),
+                                           thread_name_prefix='avatar')
+        return _executor
+
+
+def _run(kind, pk, name):
+    close_old_connections()
+    try:
+        process_avatar(kind, pk, name)
+    except Exception:
+        logger.exception("Thumbnailing avatar %s of %s %s failed", name, kind, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(kind, pk, name):
+    """Thumbnail ``name`` once the current transaction commits.
+
+    With ATTENDANCE_AVATAR_WORKERS = 0 the thumbnails are rendered inline.
+    """
+    def submit():
+        if getattr(settings, 'ATTENDANCE_AVATAR_WORKERS', 2):
+            _pool().submit(_run, kind, pk, name)
+        else:
+            process_avatar(kind, pk, name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+
+from . import fragments, heatmap, rosters
+from .models import AttendanceRecord, AttendanceSession, ClassRoster, Student, Subject
+
+
+# ========================================= Session Bitmaps =========================================
+# Each AttendanceSession packs the presence of the students marked in it into
+# one bit per student. Rosters are stored once (ClassRoster) and shared by
+# every session that marked the same ordered list of students, so a session
+# costs ceil(students / 8) bytes instead of one AttendanceRecord row per
+# student. Students left unmarked are not on the session's roster: like
+# AttendanceSummary, only marked sessions count as delivered.
+# Most sessions mark the whole class. Its membership comes from the roster
+# index (rosters.py), and its ClassRoster is kept per process until the class
+# changes, so marking a class costs no roster queries. prune_rosters() deletes
+# the rosters that no session uses any more.
+
+ID_DTYPE = np.dtype('<i8')
+
+# class name -> (rosters.class_roster() result, its ClassRoster)
+_current = {}
+_current_lock = threading.Lock()
+
+
+def _pack(class_name, ids):
+    packed = np.array(sorted(ids), dtype=ID_DTYPE).tobytes()
+    return packed, hashlib.sha256(class_name.encode() + b'\0' + packed).hexdigest()
+
+
+def roster_for(class_name, student_ids=None):
+    """Return the ClassRoster of ``student_ids`` (default: the whole class), creating it if new."""
+    members = rosters.class_roster(class_name)
+    class_ids = {student_id for student_id, _ in members}
+    ids = class_ids if student_ids is None else set(student_ids)
+    whole_class = ids == class_ids
+    if whole_class:
+        with _current_lock:
+            entry = _current.get(class_name)
+        # class_roster() returns the same tuple until the class changes
+        if entry is not None and entry[0] is members:
+            return entry[1]
+
+    packed, digest = _pack(class_name, ids)
+    roster, _ = ClassRoster.objects.get_or_create(
+        digest=digest, defaults={'class_name': class_name, 'student_ids': packed},
+    )
+    if whole_class:
+        def remember():
+            with _current_lock:
+                _current[class_name] = (members, roster)
+        # A rolled back transaction takes a new roster with it
+        transaction.on_commit(remember)
+    return roster
+
+
+def prune_rosters():
+    """Delete the rosters no session uses, except each class's current one. Returns how many were deleted."""
+    unused = ClassRoster.objects.filter(sessions__isnull=True)
+    class_names = set(unused.values_list('class_name', flat=True))
+    members = defaultdict(set)
+    for student_id, class_name in Student.objects.filter(class_name__in=class_names).values_list('pk', 'class_name'):
+        members[class_name].add(student_id)
+    # Processes may still hold the current roster of a class (see roster_for)
+    current = [_pack(class_name, members[class_name])[1] for class_name in class_names]
+    deleted, _ = unused.exclude(digest__in=current).delete()
+    return deleted
+
+
+def roster_ids(roster_bytes):
+    return np.frombuffer(bytes(roster_bytes), dtype=ID_DTYPE)
+
+
+def pack_presence(ids, present_ids):
+    return np.packbits(np.isin(ids, np.fromiter(present_ids, dtype=ID_DTYPE))).tobytes()
+
+
+# ------------------------------------------------ Building ------------------------------------------------
+
+def build_sessions(subject_id, dates=None):
+    """
+    (Re)build the sessions of one subject from its AttendanceRecord rows,
+    optionally only for ``dates``, and delete the sessions that have no
+    records left. Returns the number of sessions written.
+    """
+    records = AttendanceRecord.objects.filter(subject_id=subject_id)
+    if dates is not None:
+        # Model instances may still hold the ISO string they were given
+        dates = {date.fromisoformat(day) if isinstance(day, str) else day for day in dates}
+        records = records.filter(date__in=dates)
+
+    marks = defaultdict(dict)
+    for on_date, student_id, present in records.values_list('date', 'student_id', 'present').iterator():
+        marks[on_date][student_id] = present
+    if dates is None:
+        emptied = set(AttendanceSession.objects.filter(subject_id=subject_id).exclude(date__in=list(marks))
+                      .values_list('date', flat=True))
+    else:
+        emptied = dates - set(marks)
+
+    sessions = []
+    if marks:
+        subject = Subject.objects.only('student_class').get(pk=subject_id)
+        by_roster = defaultdict(list)
+        for on_date, session_marks in marks.items():
+            by_roster[frozenset(session_marks)].append(on_date)
+        for student_ids, session_dates in by_roster.items():
+            roster = roster_for(subject.student_class, student_ids)
+            ids = roster_ids(roster.student_ids)
+            for on_date in session_dates:
+                present = [student_id for student_id, is_present in marks[on_date].items() if is_present]
+                sessions.append(AttendanceSession(
+                    subject_id=subject_id, date=on_date, roster=roster,
+                    present=pack_presence(ids, present), present_count=len(present),
+                ))
+    with transaction.atomic():
+        deleted = 0
+        if emptied:
+            deleted, _ = AttendanceSession.objects.filter(subject_id=subject_id, date__in=emptied).delete()
+        if sessions:
+            AttendanceSession.objects.bulk_create(
+                sessions,
+                update_conflicts=True,
+                unique_fields=['subject', 'date'],
+                update_fields=['roster', 'present', 'present_count', 'updated_at'],
+            )
+        if deleted:
+            prune_rosters()
+        if sessions or deleted:
+            # Class reports are computed from the sessions
+            fragments.bump(('subject', subject_id))
+            heatmap.invalidate(subject_id, set(marks) | emptied)
+    return len(sessions)
+
+
+# ------------------------------------------------ Queries ------------------------------------------------
+
+def _sessions_by_roster(sessions):
+    """Group ``(roster_id, bitmap, *extra)`` rows into ``{roster ids array: (bit matrix, extras)}``."""
+    grouped = defaultdict(list)
+    for roster_id, bitmap, *extra in sessions:
+        grouped[roster_id].append((bytes(bitmap), *extra))
+    rosters = dict(ClassRoster.objects.filter(pk__in=grouped).values_list('pk', 'student_ids'))
+    for roster_id, rows in grouped.items():
+        ids = roster_ids(rosters[roster_id])
+        matrix = np.frombuffer(b''.join(row[0] for row in rows), dtype=np.uint8).reshape(len(rows), -1)
+        yield ids, matrix, [row[1:] for row in rows]
+
+
+def student_percentage(student_id, subject_id):
+    """Return ``(attended, delivered, percent)`` for one student in one subject."""
+    attended = delivered = 0
+    sessions = AttendanceSession.objects.filter(subject_id=subject_id).values_list('roster_id', 'present')
+    for ids, matrix, _ in _sessions_by_roster(sessions):
+        position = np.searchsorted(ids, student_id)
+        if position == len(ids) or ids[position] != student_id:
+            continue
+        bits = (matrix[:, position >> 3] >> (7 - (position & 7))) & 1
+        attended += int(bits.sum())
+        delivered += len(bits)
+    percent = round(attended / delivered * 100, 2) if delivered else 0
+    return attended, delivered, percent
+
+
+def absentees(on_date, subject_id=None):
+    """Return ``{subject id: [absent student ids]}`` for every session held on ``on_date``."""
+    sessions = AttendanceSession.objects.filter(date=on_date)
+    if subject_id:
+        sessions = sessions.filter(subject_id=subject_id)
+    absent = {}
+    for ids, matrix, extras in _sessions_by_roster(sessions.values_list('roster_id', 'present', 'subject_id')):
+        bits = np.unpackbits(matrix, axis=1, count=len(ids)).astype(bool)
+        for (session_subject_id,), row in zip(extras, bits):
+            absent[session_subject_id] = ids[~row].tolist()
+    return absent
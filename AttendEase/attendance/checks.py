@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+# ========================================= Shared Cache Checks =========================================
+# Caches that are invalidated by writes must be shared by every worker
+# process: a per-process LocMemCache only forgets entries in the process that
+# made the write, and the others keep serving them until they expire.
+
+SHARED_CACHES = {
+    'ATTENDANCE_ROLE_CACHE': "user roles",
+    'ATTENDANCE_FRAGMENT_CACHE': "dashboard fragments and class rosters",
+    'ATTENDANCE_CALENDAR_CACHE': "calendar counts",
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    for setting, what in SHARED_CACHES.items():
+        alias = getattr(settings, setting, 'default')
+        if isinstance(caches[alias], LocMemCache):
+            errors.append(Error(
+                f"{setting} ('{alias}') is a per-process LocMemCache, so other processes keep serving stale {what}.",
+                hint="Point it at a shared cache such as Redis or Memcached.",
+                id='attendance.E001',
+            ))
+    return errors
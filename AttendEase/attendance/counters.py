@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Attendance, AttendanceRecord, Faculty, Student, Subject
+
+
+# ========================================= Reporting Dashboard Counters =========================================
+# Row counts are cached and adjusted from signals (see signals.py). Writes that
+# bypass signals are picked up once the entry expires, so counters are never
+# staler than ATTENDANCE_COUNTER_TIMEOUT seconds.
+
+COUNTED_MODELS = {
+    'attendance': AttendanceRecord,
+    # Not yet merged into AttendanceRecord (see merge_attendance)
+    'legacy_attendance': Attendance,
+    'students': Student,
+    'subjects': Subject,
+    'faculties': Faculty,
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'ATTENDANCE_COUNTER_CACHE', 'default')]
+
+
+def _key(name):
+    return f'attendance:count:{name}'
+
+
+def get_counts():
+    """Return ``{name: row count}`` for every counted model, counting only what is not cached."""
+    cache = _cache()
+    cached = cache.get_many([_key(name) for name in COUNTED_MODELS])
+    counts = {}
+    for name, model in COUNTED_MODELS.items():
+        if _key(name) in cached:
+            counts[name] = cached[_key(name)]
+        else:
+            counts[name] = model.objects.count()
+            # add() so a concurrent bump that already set the key is not overwritten
+            cache.add(_key(name), counts[name], getattr(settings, 'ATTENDANCE_COUNTER_TIMEOUT', 300))
+    return counts
+
+
+def bump(model, delta):
+    """Adjust the cached counter for ``model`` by ``delta``; missing entries are recounted on next read."""
+    name = next((name for name, counted in COUNTED_MODELS.items() if counted is model), None)
+    if name is None or not delta:
+        return
+
+    def incr():
+        try:
+            _cache().incr(_key(name), delta)
+        except ValueError:
+            pass
+
+    # Rolled-back writes must not move the counter
+    transaction.on_commit(incr)
+
+
+def invalidate(model=None):
+    """Drop the cached counter for ``model`` (or all counters) after a bulk change."""
+    names = [name for name, counted in COUNTED_MODELS.items() if model in (None, counted)]
+    _cache().delete_many([_key(name) for name in names])
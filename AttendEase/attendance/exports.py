@@ -0,0 +1,166 @@
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import Attendance, AttendanceRecord
+
+
+# ========================================= Attendance Export =========================================
+
+EXPORT_HEADER = ['Date', 'Roll No', 'Username', 'First Name', 'Last Name',
+                 'Course Code', 'Course Name', 'Class', 'Semester', 'Status']
+
+# source -> (model, columns matching EXPORT_HEADER, presence flag)
+EXPORT_SOURCES = {
+    'records': (AttendanceRecord, [
+        'date', 'student__roll_no', 'student__user__username', 'student__first_name', 'student__last_name',
+        'subject__course_code', 'subject__course_name', 'subject__student_class', 'subject__semester', 'present',
+    ]),
+    'attendance': (Attendance, [
+        'date', 'student__student__roll_no', 'student__username', 'student__first_name', 'student__last_name',
+        'subject__course_code', 'subject__course_name', 'subject__student_class', 'subject__semester', 'status',
+    ]),
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_rows(source='records', subject=None, class_name=None, start=None, end=None, semester=None):
+    """Yield export rows (as tuples matching ``EXPORT_HEADER``) without loading the result set."""
+    model, columns = EXPORT_SOURCES[source]
+    queryset = model.objects.all()
+    if subject:
+        queryset = queryset.filter(subject_id=subject)
+    if class_name:
+        queryset = queryset.filter(subject__student_class=class_name)
+    if semester:
+        queryset = queryset.filter(subject__semester=semester)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+
+    for row in queryset.order_by('date').values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row[:-1] + ('Present' if row[-1] else 'Absent',)
+
+
+def _cell(value):
+    """Quote user-supplied text that a spreadsheet would otherwise run as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object that hands back whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([_cell(value) for value in row]))
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+# ------------------------------------------------ XLSX ------------------------------------------------
+# A minimal single-sheet workbook written straight into a non-seekable zip
+# stream, so bytes go out while rows are still being read.
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class _Drain:
+    """Write-only sink that collects zip output until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t>{escape(str(_cell(value)))}</t></is></c>' if value is not None else '<c/>'
+        for value in values
+    )
+    return f'<row>{cells}</row>'
+
+
+def xlsx_stream(rows):
+    sink = _Drain()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(EXPORT_HEADER).encode())
+            chunk = []
+            for row in rows:
+                chunk.append(_xlsx_row(row))
+                if len(chunk) == EXPORT_CHUNK_SIZE:
+                    sheet.write(''.join(chunk).encode())
+                    chunk = []
+                    yield sink.drain()
+            sheet.write(''.join(chunk).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
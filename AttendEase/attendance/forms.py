@@ -37,38 +37,90 @@ class SubjectForm(forms.ModelForm):
 # ================================================== 4. Attendance Form =======================================================
 from django import forms
 from .models import Subject, Student
+from .rosters import subject_roster
+
+# Picking a subject reloads the page with that subject's roster
+SUBJECT_RELOAD = forms.Select(attrs={'onchange': "window.location.search = '?subject=' + this.value"})
+
+
+def scope_to_roster(form):
+    """Offer only the students of the chosen subject's class, from the roster index."""
+    value = form.data.get(form.add_prefix('subject')) if form.is_bound else form.initial.get('subject')
+    value = getattr(value, 'pk', value)
+    try:
+        subject = form.fields['subject'].queryset.only('student_class').get(pk=value) if value else None
+    except (Subject.DoesNotExist, ValueError, TypeError):
+        subject = None
+    form.fields['students'].choices = subject_roster(subject) if subject else ()
+
 
 class AttendanceForm(forms.Form):
-    subject = forms.ModelChoiceField(queryset=Subject.objects.all(), label="Select Subject")
+    subject = forms.ModelChoiceField(queryset=Subject.objects.all(), label="Select Subject", widget=SUBJECT_RELOAD)
     date = forms.DateField(widget=forms.SelectDateWidget, label="Select Date")
-    students = forms.ModelMultipleChoiceField(
-        queryset=Student.objects.all(),
+    students = forms.TypedMultipleChoiceField(
+        coerce=int,
         widget=forms.CheckboxSelectMultiple,
         label="Select Students Present"
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        scope_to_roster(self)
+
 
 
 # forms.py
 
 from django import forms
-from .models import Attendance, Subject
-from django.contrib.auth.models import User
+from .models import Subject
+from .services import mark_roster
 
 class MarkAttendanceForm(forms.Form):
     date = forms.DateField(widget=forms.SelectDateWidget())
-    subject = forms.ModelChoiceField(queryset=Subject.objects.all(), empty_label="Select Subject")
-    students = forms.ModelMultipleChoiceField(queryset=User.objects.all(), widget=forms.CheckboxSelectMultiple, required=False)
+    subject = forms.ModelChoiceField(queryset=Subject.objects.all(), empty_label="Select Subject", widget=SUBJECT_RELOAD)
+    students = forms.TypedMultipleChoiceField(coerce=int, widget=forms.CheckboxSelectMultiple, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        scope_to_roster(self)
 
     def save(self, faculty, *args, **kwargs):
         subject = self.cleaned_data['subject']
         date = self.cleaned_data['date']
         students = self.cleaned_data['students']
-        for student in students:
-            attendance, created = Attendance.objects.get_or_create(
-                student=student,
-                subject=subject,
-                date=date,
-                defaults={'status': True}  # Mark as present by default
-            )
-        return students
\ No newline at end of file
+        # Mark as present by default
+        mark_roster(subject.pk, date, {student_id: True for student_id in students}, source='mark')
+        return students
+
+# ================================================== 5. Edit Attendance Formset =======================================================
+# A model formset checks each submitted row id with its own query; the edit
+# page already loaded every row of the session, so look the ids up there.
+
+class LoadedRowField(forms.Field):
+    widget = forms.HiddenInput
+
+    def __init__(self, formset, **kwargs):
+        super().__init__(**kwargs)
+        self.formset = formset
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if self.formset._loaded_rows is None:
+            self.formset._loaded_rows = {str(row.pk): row for row in self.formset.get_queryset()}
+        row = self.formset._loaded_rows.get(str(value))
+        if row is None:
+            raise forms.ValidationError("Select a valid row.", code='invalid_choice')
+        return row
+
+    def has_changed(self, initial, data):
+        return str(initial or '') != str(data or '')
+
+
+class LoadedRowsFormSet(forms.BaseModelFormSet):
+    _loaded_rows = None
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self._pk_field.name
+        form.fields[name] = LoadedRowField(self, initial=form.fields[name].initial, required=False)
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+# ========================================= Dashboard Fragment Cache =========================================
+# Dashboard tables are cached under a key that includes the version counter of
+# every entity they show, e.g. ('subject', 3) or ('class', 'CSE-A'). Writes
+# bump the counters (see signals.py and summary.apply_deltas), so the next
+# render misses and the stale entry simply expires. Entities:
+#
+#   ('subject', pk)      the subject row and its attendance
+#   ('class', name)      the class roster and its list of subjects
+#   ('faculty', pk)      the subjects a faculty member teaches
+#   ('table', name)      first page of a reporting table: students, subjects, faculties
+#
+# Names come from user data and query strings, so they are hashed into the
+# key (Memcached rejects spaces and long keys), and counters expire after
+# ATTENDANCE_VERSION_TIMEOUT. An expired counter restarts from the clock, so
+# it only costs a miss.
+
+def _cache():
+    return caches[getattr(settings, 'ATTENDANCE_FRAGMENT_CACHE', 'default')]
+
+
+def _version_key(entity):
+    kind, name = entity
+    return 'attendance:version:%s:%s' % (kind, hashlib.md5(str(name).encode()).hexdigest())
+
+
+def versions(*entities):
+    """Return the current version of each entity, starting counters that do not exist yet."""
+    cache = _cache()
+    keys = [_version_key(entity) for entity in entities]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Start from the clock, not 1, so a counter that was evicted never
+        # repeats a version an old fragment was cached under
+        start = time.time_ns()
+        timeout = getattr(settings, 'ATTENDANCE_VERSION_TIMEOUT', 86400)
+        for key in missing:
+            cache.add(key, start, timeout)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+def _increment(keys):
+    cache = _cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never read, so nothing is cached under it
+            pass
+
+
+def bump(*entities):
+    """Invalidate every fragment that shows one of ``entities``."""
+    keys = [_version_key(entity) for entity in entities]
+    _increment(keys)
+    # A request that read the rows between the write and its commit may have
+    # cached them under the new version; bump again once they are visible
+    transaction.on_commit(lambda: _increment(keys))
+
+
+# ------------------------------------------------ Cached Values ------------------------------------------------
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def cached(name, entities, key, compute):
+    """
+    Return ``compute()``, cached until one of ``entities`` changes. ``key``
+    holds whatever else the value depends on (user, filters, ...).
+    """
+    digest = hashlib.md5(repr((key, versions(*entities))).encode()).hexdigest()
+    cache_key = f'attendance:fragment:{name}:{digest}'
+    cache = _cache()
+    value = cache.get(cache_key)
+    hit = value is not None
+    if not hit:
+        value = compute()
+        cache.set(cache_key, value, getattr(settings, 'ATTENDANCE_FRAGMENT_TIMEOUT', 3600))
+    with _stats_lock:
+        _stats[name, hit] += 1
+    return value
+
+
+def render_fragment(template, entities, key, context):
+    """Render ``template`` with ``context()`` unless it is cached for ``entities`` and ``key``."""
+    return mark_safe(cached(template, entities, key, lambda: render_to_string(template, context())))
+
+
+def stats():
+    """Return ``{fragment: {'hits', 'misses', 'hit_rate'}}`` for this process."""
+    with _stats_lock:
+        names = sorted({name for name, _ in _stats})
+        return {
+            name: {
+                'hits': _stats[name, True],
+                'misses': _stats[name, False],
+                'hit_rate': round(_stats[name, True] / (_stats[name, True] + _stats[name, False]), 3),
+            }
+            for name in names
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
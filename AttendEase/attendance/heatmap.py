@@ -0,0 +1,108 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import fragments
+from .models import AttendanceRecord
+
+
+# ========================================= Attendance Calendar =========================================
+# Per-day (marked, present) counts of each subject, for calendar heatmaps.
+# Every month that is missing from the cache is counted with one GROUP BY
+# over AttendanceRecord. Months that have ended are then cached for
+# ATTENDANCE_CALENDAR_TIMEOUT, while the current month is always recounted.
+# Each month's key includes a ('calendar', 'subject:YYYY-MM') version counter
+# (see fragments.py) that writes to the month bump, so the stale entry is
+# skipped in every process (see invalidate()). Legacy Attendance rows are
+# counted once `manage.py merge_attendance` has moved them.
+
+MAX_MONTHS = 12
+
+
+def _cache():
+    return caches[getattr(settings, 'ATTENDANCE_CALENDAR_CACHE', 'default')]
+
+
+def _entity(subject_id, month):
+    return 'calendar', f'{subject_id}:{month:%Y-%m}'
+
+
+def _key(subject_id, month, version):
+    return f'attendance:calendar:{subject_id}:{month:%Y-%m}:{version}'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def months_between(first, last):
+    """Return the first day of every month from ``first`` to ``last``, inclusive."""
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def daily_counts(subject_ids, first_month, last_month, today=None):
+    """
+    Return ``{subject id: {date: (marked, present)}}`` for every day from
+    ``first_month`` to the end of ``last_month`` that has marks.
+    """
+    current = month_start(today or timezone.localdate())
+    months = months_between(first_month, last_month)
+    cache = _cache()
+    closed = [(subject_id, month) for subject_id in subject_ids for month in months if month < current]
+    versions = fragments.versions(*(_entity(subject_id, month) for subject_id, month in closed))
+    keys = {(subject_id, month): _key(subject_id, month, version)
+            for (subject_id, month), version in zip(closed, versions)}
+    cached = cache.get_many(list(keys.values()))
+
+    counts = {subject_id: {} for subject_id in subject_ids}
+    missing = {(subject_id, month) for subject_id in subject_ids for month in months if month >= current}
+    for (subject_id, month), key in keys.items():
+        if key in cached:
+            counts[subject_id].update(cached[key])
+        else:
+            missing.add((subject_id, month))
+    if not missing:
+        return counts
+
+    fresh = defaultdict(dict)
+    rows = (
+        AttendanceRecord.objects
+        .filter(subject_id__in={subject_id for subject_id, _ in missing},
+                date__gte=min(month for _, month in missing),
+                date__lt=next_month(max(month for _, month in missing)))
+        .values('subject_id', 'date')
+        .annotate(marked=Count('pk'), present=Count('pk', filter=Q(present=True)))
+        .order_by()
+        .values_list('subject_id', 'date', 'marked', 'present')
+    )
+    for subject_id, day, marked, present in rows:
+        fresh[subject_id, month_start(day)][day] = (marked, present)
+
+    for subject_id, month in missing:
+        counts[subject_id].update(fresh[subject_id, month])
+    cache.set_many({keys[subject_id, month]: fresh[subject_id, month]
+                    for subject_id, month in missing if month < current},
+                   getattr(settings, 'ATTENDANCE_CALENDAR_TIMEOUT', 86400))
+    return counts
+
+
+def invalidate(subject_id, dates):
+    """Retire the cached months of ``subject_id`` that contain any of ``dates``, in every process."""
+    # Model instances may still hold the ISO string they were given
+    entities = {_entity(subject_id, month_start(date.fromisoformat(day) if isinstance(day, str) else day))
+                for day in dates}
+    if entities:
+        # Bumped again once the write commits (see fragments.bump)
+        fragments.bump(*entities)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from attendance.bitmaps import build_sessions, prune_rosters
+from attendance.models import Subject
+
+
+class Command(BaseCommand):
+    help = "Rebuild the packed per-session attendance bitmaps from AttendanceRecord and prune unused rosters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', type=int, action='append',
+                            help="Only rebuild this subject id (may be repeated).")
+
+    def handle(self, *args, **options):
+        subject_ids = options['subject'] or Subject.objects.values_list('pk', flat=True)
+        total = 0
+        for subject_id in subject_ids:
+            total += build_sessions(subject_id)
+        pruned = prune_rosters()
+        self.stdout.write(self.style.SUCCESS(f"Built {total} sessions, pruned {pruned} unused rosters."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from attendance.avatars import AVATAR_MODELS, process_avatar
+
+
+class Command(BaseCommand):
+    help = "Render the avatar thumbnails that are missing, e.g. for avatars uploaded before thumbnails existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Re-render every avatar, not only those without a thumbnail.")
+
+    def handle(self, *args, **options):
+        built = 0
+        for kind, model in AVATAR_MODELS.items():
+            profiles = model.objects.exclude(avatar='').exclude(avatar=model.avatar.field.default)
+            if not options['all']:
+                profiles = profiles.filter(avatar_thumb='')
+            for pk, name in profiles.values_list('pk', 'avatar').iterator():
+                built += process_avatar(kind, pk, name) is not None
+        self.stdout.write(self.style.SUCCESS(f"Thumbnailed {built} avatars."))
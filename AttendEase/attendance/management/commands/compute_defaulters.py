@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from attendance.analytics import DEFAULTER_THRESHOLD, compute_defaulters
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored list of students below the attendance threshold for subjects marked since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULTER_THRESHOLD,
+                            help="Attendance percentage below which a student is a defaulter.")
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute every subject instead of only those changed since the last run.")
+
+    def handle(self, *args, **options):
+        run = compute_defaulters(threshold=options['threshold'], full=options['full'])
+        kind = "Full" if run.full else "Incremental"
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind} run: recomputed {run.subjects} subjects, {run.defaulters} defaulters below {run.threshold}%."
+        ))
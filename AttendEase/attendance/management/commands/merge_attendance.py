@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from attendance.services import merge_legacy_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge legacy Attendance rows into AttendanceRecord in batches. Each batch is its own "
+        "transaction, so the command can be stopped and re-run at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches (the rest is merged on the next run).")
+
+    def handle(self, *args, **options):
+        after, batches = 0, 0
+        totals = {'merged': 0, 'superseded': 0, 'orphaned': 0}
+        while options['max_batches'] is None or batches < options['max_batches']:
+            after, merged, superseded, orphaned = merge_legacy_batch(options['batch_size'], after)
+            if after is None:
+                break
+            batches += 1
+            totals['merged'] += merged
+            totals['superseded'] += superseded
+            totals['orphaned'] += orphaned
+            self.stdout.write(f"batch {batches}: up to id {after}, {merged} merged, {superseded} superseded")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['merged']} rows merged, {totals['superseded']} superseded by existing records."
+        ))
+        if totals['orphaned']:
+            self.stdout.write(self.style.WARNING(
+                f"{totals['orphaned']} rows belong to users without a student profile and were left in place."
+            ))
@@ -0,0 +1,46 @@
+import json
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.metrics import summarize
+
+SORT_KEYS = {'latency': 'p95_ms', 'queries': 'max_queries', 'sql': 'sql_ms', 'size': 'mean_bytes',
+             'budget': 'over_budget'}
+
+
+class Command(BaseCommand):
+    help = "Print the slowest / most query-hungry views recorded by QueryMetricsMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url',
+                            help="Fetch the summary from a running server's metrics endpoint "
+                                 "(e.g. http://127.0.0.1:8000/metrics/); defaults to this process's buffer.")
+        parser.add_argument('--token', default='', help="Bearer token for --url (ATTENDANCE_METRICS_TOKEN).")
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='latency')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['url']:
+            request = Request(f"{options['url'].rstrip('?')}?format=json",
+                              headers={'Authorization': f"Bearer {options['token']}"} if options['token'] else {})
+            try:
+                with urlopen(request, timeout=10) as response:
+                    summary = json.load(response)['summary']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Could not read metrics from {options['url']}: {e}")
+        else:
+            summary = summarize()
+
+        key = SORT_KEYS[options['sort']]
+        rows = sorted(summary, key=lambda row: row[key], reverse=True)[:options['top']]
+        if not rows:
+            self.stdout.write("No requests recorded.")
+            return
+        self.stdout.write(f"{'view':<32} {'role':<10} {'reqs':>6} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'queries':>8} {'max q':>6} {'sql ms':>9} {'bytes':>9} {'over':>5}")
+        for row in rows:
+            line = (f"{row['view']:<32} {row['role']:<10} {row['requests']:>6} {row['p50_ms']:>9} "
+                    f"{row['p95_ms']:>9} {row['mean_queries']:>8} {row['max_queries']:>6} {row['sql_ms']:>9} "
+                    f"{row['mean_bytes']:>9} {row['over_budget']:>5}")
+            self.stdout.write(self.style.WARNING(line) if row['over_budget'] else line)
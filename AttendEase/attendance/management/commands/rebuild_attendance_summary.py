@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.summary import find_drift, rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-student attendance summary from the raw attendance tables, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare the summary with the raw tables and report drift.")
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = rebuild_summary()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} summary rows."))
+            return
+
+        drift = find_drift()
+        for (user_id, subject_id), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(
+                f"user={user_id} subject={subject_id}: stored {stored[1]}/{stored[0]}, "
+                f"expected {expected[1]}/{expected[0]}"
+            )
+        if drift:
+            raise CommandError(f"{len(drift)} summary rows have drifted; run without --check to rebuild.")
+        self.stdout.write(self.style.SUCCESS("Attendance summary is up to date."))
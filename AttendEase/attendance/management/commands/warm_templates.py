@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from attendance.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = "Compile every attendance template, reporting how long it takes (and catching syntax errors)."
+
+    def handle(self, *args, **options):
+        # Start from an empty cache, in case ready() already warmed it
+        for loader in engines['django'].engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+        started = time.perf_counter()
+        names = warm_templates()
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {len(names)} templates in {(time.perf_counter() - started) * 1000:.1f} ms."
+        ))
@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .roles import user_access
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================= Request Metrics =========================================
+# QueryMetricsMiddleware times every request, counts its queries and SQL time
+# through a connection execute wrapper, and keeps the last
+# ATTENDANCE_METRICS_BUFFER samples in memory (per process). Requests that run
+# more queries than their budget are logged and flagged with a response header.
+# Under ASGI the middleware stays async; the queries of async views run in
+# sync_to_async's thread, so the wrapper is installed on that thread's connection.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+@dataclass
+class Sample:
+    view: str
+    role: str
+    method: str
+    status: int
+    seconds: float
+    queries: int
+    sql_seconds: float
+    size: int
+    over_budget: bool
+
+
+_buffer = None
+_lock = threading.Lock()
+
+
+def _samples():
+    global _buffer
+    if _buffer is None:
+        _buffer = deque(maxlen=getattr(settings, 'ATTENDANCE_METRICS_BUFFER', 5000))
+    return _buffer
+
+
+def record(sample):
+    with _lock:
+        _samples().append(sample)
+
+
+def samples():
+    with _lock:
+        return list(_samples())
+
+
+def reset():
+    global _buffer
+    with _lock:
+        _buffer = None
+
+
+def query_budget(view):
+    budgets = getattr(settings, 'ATTENDANCE_QUERY_BUDGETS', {})
+    return budgets.get(view, getattr(settings, 'ATTENDANCE_QUERY_BUDGET', 30))
+
+
+def user_role(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+    role, groups = user_access(user)
+    return role or (groups[0].lower() if groups else 'user')
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _add_timer(timer):
+    connection.execute_wrappers.append(timer)
+
+
+def _remove_timer(timer):
+    connection.execute_wrappers.remove(timer)
+
+
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        await sync_to_async(_add_timer)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_timer)(timer)
+        # Resolving the user's role may query the database
+        await sync_to_async(self._record)(request, response, timer, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, timer, seconds):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        budget = query_budget(view)
+        over_budget = timer.queries > budget
+        if over_budget:
+            logger.warning("%s ran %d queries (budget %d)", request.path, timer.queries, budget)
+            response['X-Query-Budget-Exceeded'] = f'{timer.queries}/{budget}'
+
+        user = getattr(request, 'user', None)
+        record(Sample(
+            view=view,
+            role=user_role(user) if user is not None else 'anonymous',
+            method=request.method,
+            status=response.status_code,
+            seconds=seconds,
+            queries=timer.queries,
+            sql_seconds=timer.seconds,
+            size=0 if response.streaming else len(response.content),
+            over_budget=over_budget,
+        ))
+
+
+# ------------------------------------------------ Reports ------------------------------------------------
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def summarize(rows=None):
+    """Aggregate samples into one dict per (view, role), slowest first."""
+    groups = defaultdict(list)
+    for sample in samples() if rows is None else rows:
+        groups[sample.view, sample.role].append(sample)
+    summary = []
+    for (view, role), group in groups.items():
+        seconds = [sample.seconds for sample in group]
+        queries = [sample.queries for sample in group]
+        summary.append({
+            'view': view,
+            'role': role,
+            'requests': len(group),
+            'p50_ms': round(_percentile(seconds, 0.5) * 1000, 2),
+            'p95_ms': round(_percentile(seconds, 0.95) * 1000, 2),
+            'mean_queries': round(sum(queries) / len(group), 1),
+            'max_queries': max(queries),
+            'sql_ms': round(sum(sample.sql_seconds for sample in group) * 1000, 2),
+            'mean_bytes': sum(sample.size for sample in group) // len(group),
+            'over_budget': sum(sample.over_budget for sample in group),
+        })
+    summary.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return summary
+
+
+def _histogram(name, groups, value, buckets):
+    lines = [f'# TYPE {name} histogram']
+    for (view, role), group in sorted(groups.items()):
+        labels = f'view="{view}",role="{role}"'
+        values = [value(sample) for sample in group]
+        for bound in buckets:
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {sum(v <= bound for v in values)}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {len(values)}')
+        lines.append(f'{name}_sum{{{labels}}} {sum(values)}')
+        lines.append(f'{name}_count{{{labels}}} {len(values)}')
+    return lines
+
+
+def prometheus_text():
+    """Render the buffered samples in the Prometheus text exposition format."""
+    groups = defaultdict(list)
+    for sample in samples():
+        groups[sample.view, sample.role].append(sample)
+    lines = _histogram('attendease_request_duration_seconds', groups, lambda s: s.seconds, DURATION_BUCKETS)
+    lines += _histogram('attendease_request_queries', groups, lambda s: s.queries, QUERY_BUCKETS)
+    for name, value in (('attendease_request_sql_seconds', lambda s: s.sql_seconds),
+                        ('attendease_response_bytes', lambda s: s.size),
+                        ('attendease_query_budget_exceeded', lambda s: int(s.over_budget))):
+        lines.append(f'# TYPE {name} counter')
+        for (view, role), group in sorted(groups.items()):
+            lines.append(f'{name}_total{{view="{view}",role="{role}"}} {sum(value(sample) for sample in group)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['subject', 'date'], name='att_subject_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='att_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['subject', 'date'], name='attrec_subject_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'student'], name='attrec_date_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'subject'], name='attrec_student_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['student_class', 'academic_year', 'semester'], name='subject_class_term_idx'),
+        ),
+    ]
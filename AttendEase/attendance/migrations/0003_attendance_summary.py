@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_summary(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+
+    counters = {}
+    for model, user_field, flag in ((Attendance, 'student_id', 'status'),
+                                    (AttendanceRecord, 'student__user_id', 'present')):
+        rows = model.objects.values_list(user_field, 'subject_id').annotate(
+            delivered=Count('pk'), attended=Count('pk', filter=Q(**{flag: True})),
+        ).order_by()
+        for user_id, subject_id, delivered, attended in rows:
+            total_delivered, total_attended = counters.get((user_id, subject_id), (0, 0))
+            counters[user_id, subject_id] = (total_delivered + delivered, total_attended + attended)
+
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(student_id=user_id, subject_id=subject_id, delivered=delivered, attended=attended)
+         for (user_id, subject_id), (delivered, attended) in counters.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendance_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attended', models.PositiveIntegerField(default=0)),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='attendance.subject')),
+            ],
+            options={
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
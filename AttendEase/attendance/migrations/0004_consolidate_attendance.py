@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max
+
+
+def remove_duplicate_records(apps, schema_editor):
+    # Before bulk marking, mark_attendance could create the same mark twice;
+    # keep the latest row of each (student, subject, date) and take the others
+    # off the summary counters.
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+
+    duplicates = (
+        AttendanceRecord.objects.values('student_id', 'subject_id', 'date')
+        .annotate(marks=Count('pk'), keep=Max('pk')).filter(marks__gt=1).order_by()
+    )
+    for group in duplicates.iterator():
+        extra = AttendanceRecord.objects.filter(
+            student_id=group['student_id'], subject_id=group['subject_id'], date=group['date'],
+        ).exclude(pk=group['keep'])
+        user_id = extra.values_list('student__user_id', flat=True)[:1].get()
+        attended = extra.filter(present=True).count()
+        AttendanceSummary.objects.filter(student_id=user_id, subject_id=group['subject_id']).update(
+            delivered=F('delivered') - (group['marks'] - 1),
+            attended=F('attended') - attended,
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_records, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='attrec_student_subject_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('student', 'subject', 'date'), name='attrec_unique_mark'),
+        ),
+    ]
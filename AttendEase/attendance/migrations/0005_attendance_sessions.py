@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_consolidate_attendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassRoster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_name', models.CharField(max_length=100)),
+                ('student_ids', models.BinaryField()),
+                ('digest', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.BinaryField()),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='attendance.subject')),
+                ('roster', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='attendance.classroster')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='session_date_idx')],
+                'unique_together': {('subject', 'date')},
+            },
+        ),
+    ]
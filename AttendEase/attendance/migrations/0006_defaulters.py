@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendance_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Defaulter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attended', models.PositiveIntegerField()),
+                ('delivered', models.PositiveIntegerField()),
+                ('percent', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DefaulterRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+                ('threshold', models.FloatField()),
+                ('high_water', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False)),
+                ('subjects', models.PositiveIntegerField(default=0)),
+                ('defaulters', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancesession',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['updated_at'], name='session_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='defaulter',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shortages', to='attendance.student'),
+        ),
+        migrations.AddField(
+            model_name='defaulter',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defaulters', to='attendance.subject'),
+        ),
+        migrations.AddIndex(
+            model_name='defaulter',
+            index=models.Index(fields=['percent'], name='defaulter_percent_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='defaulter',
+            unique_together={('student', 'subject')},
+        ),
+    ]
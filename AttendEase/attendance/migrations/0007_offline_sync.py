@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_defaulters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('date', models.DateField()),
+                ('present', models.BooleanField()),
+                ('marked_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('applied', 'Applied'), ('stale', 'Stale')], max_length=10)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='marked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['updated_at'], name='attrec_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='syncoperation',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance.student'),
+        ),
+        migrations.AddField(
+            model_name='syncoperation',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance.subject'),
+        ),
+        migrations.AddField(
+            model_name='syncoperation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_operations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='syncoperation',
+            unique_together={('user', 'key')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_offline_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faculty',
+            name='avatar_thumb',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='avatar_thumb',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
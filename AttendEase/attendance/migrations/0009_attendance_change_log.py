@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_avatar_thumbnails'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('previous', models.BooleanField(null=True)),
+                ('present', models.BooleanField(null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('month', models.DateField()),
+                ('source', models.CharField(blank=True, max_length=10)),
+                ('changed_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='attendance.student')),
+                ('subject', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='attendance.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'subject', '-changed_at'], name='attchange_history_idx'), models.Index(fields=['month'], name='attchange_month_idx')],
+            },
+        ),
+    ]
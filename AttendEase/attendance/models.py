@@ -3,15 +3,30 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from django.urls import reverse
 
 
 
 
 
+class AvatarThumbnails:
+    """Thumbnail URLs of ``avatar``, once avatars.process_avatar has rendered them."""
+
+    @property
+    def avatar_webp_url(self):
+        return reverse('avatar_thumbnail', args=[f'{self.avatar_thumb}.webp'])
+
+    @property
+    def avatar_jpeg_url(self):
+        return reverse('avatar_thumbnail', args=[f'{self.avatar_thumb}.jpg'])
+
+
 #======================================= 1. Student Profile ================================================
 
-class Student(models.Model):
+class Student(AvatarThumbnails, models.Model):
     avatar = models.ImageField(upload_to='avatars/students/', default='avatars/students/default.png')
+    # "<content hash>-<size>" of the rendered thumbnails, blank until they exist
+    avatar_thumb = models.CharField(max_length=32, blank=True, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE)  # 👈 Add this line
     first_name = models.CharField(max_length=100, null=True, blank=True)
     last_name = models.CharField(max_length=100)
@@ -27,8 +42,9 @@ class Student(models.Model):
 
 # ============================================= 2.Faculty Profile =========================================================
 
-class Faculty(models.Model):
+class Faculty(AvatarThumbnails, models.Model):
     avatar = models.ImageField(upload_to='avatars/faculty/', default='avatars/faculty/default.png')
+    avatar_thumb = models.CharField(max_length=32, blank=True, editable=False)
     first_name = models.CharField(max_length=100, default="FacultyFirst")  # Default value for first_name
     last_name = models.CharField(max_length=100, default="FacultyLast")  # Default value for last_name
     username = models.CharField(max_length=100, unique=True, default="FacultyUsername")  # Default value for username
@@ -49,18 +65,47 @@ class Subject(models.Model):
     semester = models.CharField(max_length=10)
     student_class = models.CharField(max_length=50)
 
+    class Meta:
+        indexes = [
+            # Student dashboard: subjects of a class for one academic year/semester
+            models.Index(fields=['student_class', 'academic_year', 'semester'], name='subject_class_term_idx'),
+        ]
+
     def __str__(self):
         return self.course_name
 
 
 
 # ======================================================================4. Attendance Record =============================================================================
+# The canonical attendance table: one mark per student, subject and day. Rows
+# in the legacy Attendance model below are merged into it by
+# `manage.py merge_attendance`; until then reads go through the compatibility
+# helpers in services.py.
 
 class AttendanceRecord(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     date = models.DateField()
     present = models.BooleanField(default=True)
+    # When the mark was taken (the client's clock for offline sync); the
+    # latest one wins when a synced mark conflicts with the stored one
+    marked_at = models.DateTimeField(default=timezone.now)
+    # When the row was last written; the offline sync change cursor
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves per-student history within a subject
+            models.UniqueConstraint(fields=['student', 'subject', 'date'], name='attrec_unique_mark'),
+        ]
+        indexes = [
+            # Marking and editing a class session
+            models.Index(fields=['subject', 'date'], name='attrec_subject_date_idx'),
+            # Day-wise roster
+            models.Index(fields=['date', 'student'], name='attrec_date_student_idx'),
+            # Offline sync deltas
+            models.Index(fields=['updated_at'], name='attrec_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.subject} - {self.date} - {'Present' if self.present else 'Absent'}"
@@ -87,13 +132,12 @@ def create_user_profile(sender, instance, created, **kwargs):
         # Default role is student unless changed manually
         UserProfile.objects.create(user=instance, role='student')
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
     
      
 
-# =========================================  Attendance ============================================
+# =========================================  Attendance (legacy) ============================================
+# Superseded by AttendanceRecord; kept only until `manage.py merge_attendance`
+# has moved every row across. Nothing writes to it any more.
 
 # models.py
 
@@ -110,11 +154,174 @@ class Attendance(models.Model):
     status = models.BooleanField(default=False)  # True if present, False if absent
 
     class Meta:
-        unique_together = ['student', 'subject', 'date']  # To avoid duplicate entries
+        unique_together = ['student', 'subject', 'date']  # To avoid duplicate entries (also serves student/subject lookups)
+        indexes = [
+            # Faculty dashboard: one class session
+            models.Index(fields=['subject', 'date'], name='att_subject_date_idx'),
+            models.Index(fields=['date'], name='att_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.subject.name} - {self.date} - {'Present' if self.status else 'Absent'}"
-    
-    
-    
-    
\ No newline at end of file
+
+
+# ========================================= Attendance Summary ============================================
+
+class AttendanceSummary(models.Model):
+    """
+    Attended/delivered counters per student and subject, kept up to date
+    incrementally from both attendance models (see ``attendance.summary``).
+    The semester comes from the subject.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='attendance_summaries')
+    attended = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['student', 'subject']
+
+    def __str__(self):
+        return f"{self.student.username} - {self.subject} - {self.attended}/{self.delivered}"
+
+
+# ========================================= Session Bitmaps ============================================
+# A compact, session-oriented copy of AttendanceRecord: one row per subject
+# and day with a packed presence bitmap over an ordered class roster. Built and
+# queried by attendance.bitmaps.
+
+class ClassRoster(models.Model):
+    """An ordered snapshot of student ids (packed little-endian int64), shared by every session that used it."""
+    class_name = models.CharField(max_length=100)
+    student_ids = models.BinaryField()
+    digest = models.CharField(max_length=64, unique=True)
+
+    def __str__(self):
+        return f"{self.class_name} ({len(self.student_ids) // 8} students)"
+
+
+class AttendanceSession(models.Model):
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='sessions')
+    date = models.DateField()
+    roster = models.ForeignKey(ClassRoster, on_delete=models.PROTECT, related_name='sessions')
+    # Bit i (most significant first) is set when roster student i was present
+    present = models.BinaryField()
+    present_count = models.PositiveIntegerField(default=0)
+    # High-water mark for jobs that only revisit what changed (compute_defaulters)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['subject', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='session_date_idx'),
+            models.Index(fields=['updated_at'], name='session_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {self.date} - {self.present_count} present"
+
+
+class Defaulter(models.Model):
+    """A student below the attendance threshold in a subject, as of the last ``compute_defaulters`` run."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='shortages')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='defaulters')
+    attended = models.PositiveIntegerField()
+    delivered = models.PositiveIntegerField()
+    percent = models.FloatField()
+
+    class Meta:
+        unique_together = ['student', 'subject']
+        indexes = [
+            models.Index(fields=['percent'], name='defaulter_percent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.subject} - {self.percent}%"
+
+
+class DefaulterRun(models.Model):
+    finished_at = models.DateTimeField(auto_now_add=True)
+    threshold = models.FloatField()
+    # Latest AttendanceSession.updated_at covered by this run
+    high_water = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    subjects = models.PositiveIntegerField(default=0)
+    defaulters = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.finished_at:%Y-%m-%d %H:%M} ({'full' if self.full else 'incremental'}, {self.subjects} subjects)"
+
+
+class SyncOperation(models.Model):
+    """One client-generated attendance operation received by the offline sync endpoint, kept for idempotency."""
+    STATUS_CHOICES = [
+        ('applied', 'Applied'),
+        ('stale', 'Stale'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_operations')
+    key = models.CharField(max_length=64)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    date = models.DateField()
+    present = models.BooleanField()
+    marked_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'key']
+
+    def __str__(self):
+        return f"{self.user} {self.key} ({self.status})"
+
+
+# ====================================================================== Attendance Change Log ===============================================================================================
+# Append-only history of every mark written through services.mark_roster (one
+# bulk insert per roster) or saved/deleted one row at a time. Rows reference
+# students, subjects and users without database constraints, so the history
+# outlives them. ``month`` is the partition key: the first day of the month
+# of the change, indexed so whole months can be audited or archived at once.
+# save() and delete() refuse to rewrite a row, and so do the queryset's
+# update() and delete(); only raw SQL can.
+
+class AttendanceChangeQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise ValueError("Attendance changes are append-only")
+
+    def delete(self):
+        raise ValueError("Attendance changes are append-only")
+
+
+class AttendanceChange(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    subject = models.ForeignKey(Subject, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date = models.DateField()
+    # None when the mark was created / deleted
+    previous = models.BooleanField(null=True)
+    present = models.BooleanField(null=True)
+    changed_by = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                                   related_name='+')
+    changed_at = models.DateTimeField(default=timezone.now)
+    month = models.DateField()
+    # Where the change came from: mark, edit, api, sync, or blank for single-row saves
+    source = models.CharField(max_length=10, blank=True)
+
+    objects = AttendanceChangeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # History of one student in one subject, newest first
+            models.Index(fields=['student', 'subject', '-changed_at'], name='attchange_history_idx'),
+            models.Index(fields=['month'], name='attchange_month_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Attendance changes are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Attendance changes are append-only")
+
+    def __str__(self):
+        return f"{self.student_id}/{self.subject_id} {self.date}: {self.previous} -> {self.present}"
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+
+
+# ========================================= Role Resolution =========================================
+# A user's UserProfile.role and group names are loaded with one query and
+# cached per user, so role checks on later requests (in any session) cost no
+# queries. signals.py drops the entry whenever the profile or the user's
+# groups change. Every process must see that, so ATTENDANCE_ROLE_CACHE has to
+# be shared (see checks.py); ATTENDANCE_ROLE_TIMEOUT bounds how long a revoked
+# role can outlive a lost invalidation.
+
+def _cache():
+    return caches[getattr(settings, 'ATTENDANCE_ROLE_CACHE', 'default')]
+
+
+def _key(user_id):
+    return f'attendance:access:{user_id}'
+
+
+def _load(user_id):
+    rows = list(User.objects.filter(pk=user_id).values_list('userprofile__role', 'groups__name'))
+    role = rows[0][0] if rows else None
+    return role, sorted({name for _, name in rows if name})
+
+
+def user_access(user):
+    """Return ``(profile role or None, sorted group names)`` for ``user``."""
+    if not user.is_authenticated:
+        return None, []
+    access = getattr(user, '_attendance_access', None)
+    if access is None:
+        cache = _cache()
+        access = cache.get(_key(user.pk))
+        if access is None:
+            access = _load(user.pk)
+            cache.set(_key(user.pk), access, getattr(settings, 'ATTENDANCE_ROLE_TIMEOUT', 60))
+        user._attendance_access = access
+    return access
+
+
+def get_role(user):
+    return user_access(user)[0]
+
+
+def invalidate(user_ids):
+    keys = [_key(user_id) for user_id in user_ids]
+    _cache().delete_many(keys)
+    # A request that read the old role before the change committed may have
+    # cached it again; drop it once the change is visible
+    transaction.on_commit(lambda: _cache().delete_many(keys))
@@ -0,0 +1,228 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import counters, fragments, roles
+from .models import Faculty, Student, Subject, UserProfile
+
+
+# ========================================= Roster Import =========================================
+# Streams a CSV of students, faculty or subjects and creates them in batches:
+# each batch is validated with a handful of queries, passwords are hashed in a
+# process pool (by the import_roster command; uploads hash in the web process
+# and are capped at IMPORT_UPLOAD_MAX_ROWS), and everything is written with
+# bulk_create. Hashing happens before the batch's transaction opens, so the
+# database is only write-locked for the inserts. A row created by someone else
+# between the checks and the insert rolls the batch back, and the batch is
+# imported again so the clash is reported like any existing row.
+
+IMPORT_COLUMNS = {
+    'students': ['username', 'password', 'first_name', 'last_name', 'email', 'roll_no', 'course', 'class_name'],
+    'faculty': ['username', 'password', 'first_name', 'last_name', 'email', 'department'],
+    'subjects': ['course_name', 'course_code', 'short_name', 'faculty', 'academic_year', 'semester',
+                 'student_class'],
+}
+
+# Columns that may be left empty
+OPTIONAL_COLUMNS = {'password', 'first_name'}
+
+IMPORT_BATCH_SIZE = 500
+# Larger files go through `manage.py import_roster`
+IMPORT_UPLOAD_MAX_ROWS = 100
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    errors: list = field(default_factory=list)  # (line number, message)
+
+
+def _init_worker():
+    # Workers started with "spawn" need their own app registry to hash passwords
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash ``passwords`` with the configured hasher; empty ones become unusable passwords."""
+    workers = workers or os.cpu_count() or 1
+    usable = [password for password in passwords if password]
+    if workers > 1 and len(usable) > workers:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            hashed = iter(pool.map(make_password, usable, chunksize=max(1, len(usable) // (workers * 4))))
+    else:
+        hashed = iter(map(make_password, usable))
+    return [next(hashed) if password else make_password(None) for password in passwords]
+
+
+def _clean_rows(kind, batch):
+    """Check required columns and duplicates within the batch. Returns ``(valid rows, errors)``."""
+    valid, errors, seen = [], [], {}
+    unique_columns = [column for column in ('username', 'email', 'roll_no') if column in IMPORT_COLUMNS[kind]]
+    for line, row in batch:
+        row = {column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS[kind]}
+        missing = [column for column in IMPORT_COLUMNS[kind] if not row[column] and column not in OPTIONAL_COLUMNS]
+        if missing:
+            errors.append((line, f"Missing {', '.join(missing)}."))
+            continue
+        try:
+            if 'email' in row:
+                validate_email(row['email'])
+            if row.get('password'):
+                validate_password(row['password'], User(username=row['username'], email=row['email']))
+        except ValidationError as e:
+            errors.append((line, ' '.join(e.messages)))
+            continue
+        duplicate = next((column for column in unique_columns if (column, row[column]) in seen), None)
+        if duplicate:
+            errors.append((line, f"Duplicate {duplicate} {row[duplicate]!r} (also on line {seen[duplicate, row[duplicate]]})."))
+            continue
+        for column in unique_columns:
+            seen[column, row[column]] = line
+        valid.append((line, row))
+    return valid, errors
+
+
+def _drop_existing(valid, errors, lookups):
+    """Drop rows whose unique values already exist; ``lookups`` maps column -> (model, field)."""
+    taken = {
+        column: set(model.objects.filter(**{f'{field}__in': [row[column] for _, row in valid]})
+                    .values_list(field, flat=True))
+        for column, (model, field) in lookups.items()
+    }
+    kept = []
+    for line, row in valid:
+        clash = next((column for column in lookups if row[column] in taken[column]), None)
+        if clash:
+            errors.append((line, f"{clash} {row[clash]!r} already exists."))
+        else:
+            kept.append((line, row))
+    return kept
+
+
+def _create_users(rows, role, group):
+    # Passwords were hashed before the transaction (see import_roster)
+    users = User.objects.bulk_create([
+        User(username=row['username'], password=row['password'], email=row['email'],
+             first_name=row['first_name'], last_name=row['last_name'])
+        for row in rows
+    ])
+    # bulk_create skips the post_save hooks that create profiles and reset cached roles
+    UserProfile.objects.bulk_create([UserProfile(user=user, role=role) for user in users])
+    roles.invalidate([user.pk for user in users])
+    User.groups.through.objects.bulk_create([
+        User.groups.through(user_id=user.pk, group_id=group.pk) for user in users
+    ])
+    return users
+
+
+def _import_students(valid, errors):
+    valid = _drop_existing(valid, errors, {
+        'username': (User, 'username'), 'email': (Student, 'email'), 'roll_no': (Student, 'roll_no'),
+    })
+    rows = [row for _, row in valid]
+    users = _create_users(rows, 'student', Group.objects.get_or_create(name='Student')[0])
+    Student.objects.bulk_create([
+        Student(user=user, first_name=row['first_name'], last_name=row['last_name'], email=row['email'],
+                roll_no=row['roll_no'], course=row['course'], class_name=row['class_name'])
+        for user, row in zip(users, rows)
+    ])
+    fragments.bump(('table', 'students'), *{('class', row['class_name']) for row in rows})
+    return len(rows)
+
+
+def _import_faculty(valid, errors):
+    valid = _drop_existing(valid, errors, {
+        'username': (User, 'username'), 'email': (Faculty, 'email'),
+    })
+    # Faculty are matched to their login by username (see faculty_dashboard)
+    valid = _drop_existing(valid, errors, {'username': (Faculty, 'username')})
+    rows = [row for _, row in valid]
+    _create_users(rows, 'faculty', Group.objects.get_or_create(name='Faculty')[0])
+    Faculty.objects.bulk_create([
+        Faculty(first_name=row['first_name'], last_name=row['last_name'], username=row['username'],
+                email=row['email'], department=row['department'])
+        for row in rows
+    ])
+    fragments.bump(('table', 'faculties'))
+    return len(rows)
+
+
+def _import_subjects(valid, errors):
+    faculty_ids = dict(
+        Faculty.objects.filter(username__in=[row['faculty'] for _, row in valid]).values_list('username', 'pk')
+    )
+    subjects = []
+    for line, row in valid:
+        if row['faculty'] not in faculty_ids:
+            errors.append((line, f"Faculty {row['faculty']!r} does not exist."))
+            continue
+        subjects.append(Subject(
+            course_name=row['course_name'], course_code=row['course_code'], short_name=row['short_name'],
+            faculty_id=faculty_ids[row['faculty']], academic_year=row['academic_year'],
+            semester=row['semester'], student_class=row['student_class'],
+        ))
+    Subject.objects.bulk_create(subjects)
+    fragments.bump(('table', 'subjects'), *{('class', subject.student_class) for subject in subjects},
+                   *{('faculty', subject.faculty_id) for subject in subjects})
+    return len(subjects)
+
+
+IMPORTERS = {
+    'students': (_import_students, Student),
+    'faculty': (_import_faculty, Faculty),
+    'subjects': (_import_subjects, Subject),
+}
+
+
+def _import_batch(importer, valid, errors):
+    errors = list(errors)
+    with transaction.atomic():
+        created = importer(valid, errors)
+    return created, errors
+
+
+def import_roster(csv_file, kind, batch_size=IMPORT_BATCH_SIZE, workers=None):
+    """
+    Import ``kind`` ('students', 'faculty' or 'subjects') from a text-mode CSV
+    file with a header row. Valid rows are created batch by batch; invalid
+    ones are reported in ``ImportResult.errors`` with their line number.
+    """
+    importer, model = IMPORTERS[kind]
+    result = ImportResult()
+    reader = csv.DictReader(csv_file)
+    missing = set(IMPORT_COLUMNS[kind]) - OPTIONAL_COLUMNS - set(reader.fieldnames or ())
+    if missing:
+        result.errors.append((1, f"Missing columns: {', '.join(sorted(missing))}."))
+        return result
+
+    rows = ((reader.line_num, row) for row in reader)
+    while batch := list(islice(rows, batch_size)):
+        valid, errors = _clean_rows(kind, batch)
+        if 'password' in IMPORT_COLUMNS[kind]:
+            # Slow by design: keep it out of the transaction, which holds the write lock
+            passwords = hash_passwords([row['password'] for _, row in valid], workers)
+            for (_, row), password in zip(valid, passwords):
+                row['password'] = password
+        try:
+            created, errors = _import_batch(importer, valid, errors)
+        except IntegrityError:
+            created, errors = _import_batch(importer, valid, errors)
+        result.created += created
+        result.errors.extend(errors)
+
+    # Rows were created without signals
+    counters.invalidate(model)
+    result.errors.sort()
+    return result
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from django.conf import settings
+
+from . import fragments
+from .models import Student
+
+
+# ========================================= Class Roster Index =========================================
+# Subject -> its class's students (Subject.student_class == Student.class_name),
+# ordered by roll number, kept in process memory for the marking forms. Each
+# entry remembers the ('class', name) version it was loaded at (see
+# fragments.py); Student saves, deletes and roster imports bump that version,
+# so a changed class is reloaded on its next use. That reaches other processes
+# only when ATTENDANCE_FRAGMENT_CACHE is shared (see checks.py), so entries
+# are also reloaded after ATTENDANCE_ROSTER_TIMEOUT seconds.
+
+_rosters = {}
+_lock = threading.Lock()
+
+
+def class_roster(class_name):
+    """Return ``((student id, label), ...)`` for ``class_name``, ordered by roll number."""
+    version, = fragments.versions(('class', class_name))
+    now = time.monotonic()
+    with _lock:
+        entry = _rosters.get(class_name)
+    if entry is not None and entry[0] == version and entry[1] > now:
+        return entry[2]
+
+    roster = tuple(
+        (pk, f"{roll_no} - {first_name or ''} {last_name}".strip())
+        for pk, roll_no, first_name, last_name in Student.objects.filter(class_name=class_name)
+        .order_by('roll_no').values_list('pk', 'roll_no', 'first_name', 'last_name')
+    )
+    with _lock:
+        _rosters[class_name] = (version, now + getattr(settings, 'ATTENDANCE_ROSTER_TIMEOUT', 300), roster)
+    return roster
+
+
+def subject_roster(subject):
+    return class_roster(subject.student_class)
+
+
+def clear():
+    with _lock:
+        _rosters.clear()
@@ -0,0 +1,278 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import counters
+from .audit import log_changes
+from .bitmaps import build_sessions
+from .models import Attendance, AttendanceRecord, Student, Subject, SyncOperation
+from .summary import apply_deltas, apply_roster_deltas
+
+
+# ========================================= Bulk Attendance Marking =========================================
+
+def mark_roster(subject_id, on_date, roster, marked_at=None, changed_by=None, source=''):
+    """
+    Write a whole class-session roster in one transaction.
+
+    ``roster`` maps ``Student`` ids to a presence flag; ``marked_at``
+    optionally maps them to when each mark was taken (default: now). Marks
+    that change are logged as made by ``changed_by`` through ``source`` (see
+    audit.py). Returns a ``(created, updated)`` tuple.
+    """
+    roster = {int(student_id): bool(present) for student_id, present in roster.items()}
+    if not roster:
+        return 0, 0
+    now = timezone.now()
+    marked_at = marked_at or {}
+
+    with transaction.atomic():
+        # Rosters of one subject are written one at a time, so ``previous``
+        # still holds when the upsert runs (SQLite already serializes writers)
+        list(Subject.objects.select_for_update().filter(pk=subject_id).values_list('pk'))
+        previous = dict(
+            AttendanceRecord.objects.filter(subject_id=subject_id, date=on_date, student_id__in=list(roster))
+            .values_list('student_id', 'present')
+        )
+        # (student, subject, date) is unique, so let the database resolve rows
+        # that already exist instead of updating them one by one
+        AttendanceRecord.objects.bulk_create(
+            [AttendanceRecord(student_id=student_id, subject_id=subject_id, date=on_date, present=present,
+                              marked_at=marked_at.get(student_id, now))
+             for student_id, present in roster.items()],
+            update_conflicts=True,
+            unique_fields=['student', 'subject', 'date'],
+            update_fields=['present', 'marked_at', 'updated_at'],
+        )
+
+        # Bulk writes bypass the model signals, so keep the summary in step here
+        apply_roster_deltas(AttendanceRecord, subject_id, roster, previous)
+        # and refresh the packed session bitmap for this class session
+        build_sessions(subject_id, [on_date])
+        log_changes([(student_id, subject_id, on_date, previous.get(student_id), present)
+                     for student_id, present in roster.items() if previous.get(student_id) != present],
+                    changed_by=changed_by, source=source)
+
+    updated = len(previous)
+    counters.bump(AttendanceRecord, len(roster) - updated)
+    return len(roster) - updated, updated
+
+
+# ========================================= Compatibility Reads =========================================
+# While `manage.py merge_attendance` is still moving legacy Attendance rows
+# into AttendanceRecord, reads fall back to the legacy row for any mark that
+# has not been merged yet. Once the legacy table is empty the fallback query
+# returns nothing.
+
+def presence_by_student(on_date, subject_id=None, student_ids=None):
+    """Return ``{student id: present}`` for one day, optionally limited to a subject and/or students."""
+    filters = {'date': on_date}
+    if subject_id:
+        filters['subject_id'] = subject_id
+    records, legacy = AttendanceRecord.objects.filter(**filters), Attendance.objects.filter(**filters)
+    if student_ids is not None:
+        records = records.filter(student_id__in=student_ids)
+        legacy = legacy.filter(student__student__in=student_ids)
+
+    presence = dict(records.values_list('student_id', 'present'))
+    for student_id, status in legacy.values_list('student__student', 'status'):
+        if student_id is not None:
+            presence.setdefault(student_id, status)
+    return presence
+
+
+# ========================================= Legacy Attendance Merge =========================================
+
+def merge_legacy_batch(batch_size=1000, after=0):
+    """
+    Move one batch of legacy ``Attendance`` rows (``pk > after``) into
+    ``AttendanceRecord`` in a single transaction. Where both tables hold a
+    mark for the same student, subject and day, the ``AttendanceRecord`` one
+    wins. Rows whose user has no ``Student`` profile cannot be merged and are
+    left in place.
+
+    Returns ``(last pk seen, merged, superseded, orphaned)``; ``last pk seen``
+    is ``None`` once there is nothing left after ``after``.
+    """
+    with transaction.atomic():
+        batch = list(
+            Attendance.objects.filter(pk__gt=after).order_by('pk')
+            .values_list('pk', 'student_id', 'subject_id', 'date', 'status')[:batch_size]
+        )
+        if not batch:
+            return None, 0, 0, 0
+
+        student_for_user = dict(
+            Student.objects.filter(user_id__in={user_id for _, user_id, _, _, _ in batch})
+            .values_list('user_id', 'pk')
+        )
+        rows = [row for row in batch if row[1] in student_for_user]
+        existing = set(
+            AttendanceRecord.objects.filter(
+                student_id__in={student_for_user[user_id] for _, user_id, _, _, _ in rows},
+                subject_id__in={subject_id for _, _, subject_id, _, _ in rows},
+                date__in={on_date for _, _, _, on_date, _ in rows},
+            ).values_list('student_id', 'subject_id', 'date')
+        )
+
+        merged, superseded, deltas = [], 0, {}
+        for pk, user_id, subject_id, on_date, status in rows:
+            key = (student_for_user[user_id], subject_id, on_date)
+            if key in existing:
+                # Both marks were counted in the summary; the legacy one goes away
+                superseded += 1
+                delivered, attended = deltas.setdefault(subject_id, {}).get(user_id, (0, 0))
+                deltas[subject_id][user_id] = (delivered - 1, attended - int(status))
+            else:
+                existing.add(key)
+                merged.append(AttendanceRecord(student_id=key[0], subject_id=subject_id, date=on_date,
+                                               present=status))
+
+        # Moved marks keep their user and subject, so the summary counters are
+        # already right for them; skip the per-row delete signals
+        AttendanceRecord.objects.bulk_create(merged)
+        # bulk_create skips the session signals too: pack the merged days (and
+        # refresh their calendar months) here
+        merged_days = defaultdict(set)
+        for record in merged:
+            merged_days[record.subject_id].add(record.date)
+        for subject_id, days in merged_days.items():
+            build_sessions(subject_id, days)
+        Attendance.objects.filter(pk__in=[row[0] for row in rows])._raw_delete(Attendance.objects.db)
+        for subject_id, subject_deltas in deltas.items():
+            apply_deltas(subject_id, subject_deltas)
+
+    counters.invalidate(Attendance)
+    counters.invalidate(AttendanceRecord)
+    return batch[-1][0], len(merged), superseded, len(batch) - len(rows)
+
+
+# ========================================= Offline Sync =========================================
+# Clients queue marks while offline and upload them in batches. Every
+# operation carries a client-generated key, so a retried upload is applied
+# once, and the time the mark was taken, so the latest mark for a student,
+# subject and day wins whatever order the uploads arrive in. The change cursor
+# lets clients download only the marks written since their last sync.
+# Marks taken "in the future" by a client whose clock runs fast are moved back
+# to the server's clock (plus SYNC_CLOCK_SKEW), so they cannot outrank every
+# mark taken after them.
+
+SYNC_PAGE_SIZE = 1000
+# Rows written this recently may still have slower transactions committing
+# behind them, so the cursor does not move past them yet; clients see those
+# rows again on their next sync
+SYNC_CURSOR_LAG = timedelta(seconds=5)
+SYNC_CLOCK_SKEW = timedelta(minutes=2)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def apply_sync_batch(user, operations):
+    """
+    Apply ``operations`` (dicts with ``key``, ``student``, ``subject``,
+    ``date``, ``present`` and ``marked_at``) uploaded by ``user`` in one
+    transaction. ``marked_at`` is capped at the server's clock plus
+    SYNC_CLOCK_SKEW. Returns ``{key: 'applied' | 'stale' | 'duplicate'}``.
+    """
+    latest_allowed = timezone.now() + SYNC_CLOCK_SKEW
+    unique = {}
+    for op in operations:
+        unique.setdefault(op['key'], {**op, 'marked_at': min(op['marked_at'], latest_allowed)})
+    try:
+        return _apply_sync_operations(user, unique)
+    except IntegrityError:
+        # Another upload of the same keys committed while this one ran: the
+        # batch was rolled back, and applying it again reports them as duplicates
+        return _apply_sync_operations(user, unique)
+
+
+def _apply_sync_operations(user, unique):
+    with transaction.atomic():
+        results = dict.fromkeys(
+            SyncOperation.objects.filter(user=user, key__in=list(unique)).values_list('key', flat=True), 'duplicate'
+        )
+        latest = {}
+        for key, op in unique.items():
+            if key in results:
+                continue
+            mark = (op['student'], op['subject'], op['date'])
+            current = latest.get(mark)
+            if current is not None and op['marked_at'] < current['marked_at']:
+                results[key] = 'stale'
+                continue
+            if current is not None:
+                results[current['key']] = 'stale'
+            latest[mark] = op
+            results[key] = 'applied'
+
+        # A mark already stored wins over an older one uploaded late
+        stored = AttendanceRecord.objects.filter(
+            student_id__in={mark[0] for mark in latest},
+            subject_id__in={mark[1] for mark in latest},
+            date__in={mark[2] for mark in latest},
+        ).values_list('student_id', 'subject_id', 'date', 'marked_at')
+        for student_id, subject_id, on_date, marked_at in stored:
+            op = latest.get((student_id, subject_id, on_date))
+            if op is not None and op['marked_at'] < marked_at:
+                results[op['key']] = 'stale'
+                del latest[student_id, subject_id, on_date]
+
+        # Claim the keys before writing any mark: a concurrent upload of the same
+        # keys fails here (user and key are unique) instead of after the work
+        SyncOperation.objects.bulk_create([
+            SyncOperation(user=user, key=key, student_id=op['student'], subject_id=op['subject'], date=op['date'],
+                          present=op['present'], marked_at=op['marked_at'], status=results[key])
+            for key, op in unique.items() if results[key] != 'duplicate'
+        ])
+
+        sessions = defaultdict(dict)
+        for (student_id, subject_id, on_date), op in latest.items():
+            sessions[subject_id, on_date][student_id] = op
+        # Lock subjects in the same order as every other batch
+        for (subject_id, on_date), ops in sorted(sessions.items()):
+            mark_roster(subject_id, on_date, {student_id: op['present'] for student_id, op in ops.items()},
+                        marked_at={student_id: op['marked_at'] for student_id, op in ops.items()},
+                        changed_by=user, source='sync')
+
+    return results
+
+
+def encode_cursor(updated_at, pk):
+    micros = (updated_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros:x}.{pk:x}"
+
+
+def decode_cursor(cursor):
+    """Return ``(updated_at, pk)`` for a cursor from ``encode_cursor``, or raise ValueError."""
+    micros, pk = cursor.split('.')
+    return _EPOCH + timedelta(microseconds=int(micros, 16)), int(pk, 16)
+
+
+def changes_since(subject_ids, cursor=None, limit=SYNC_PAGE_SIZE):
+    """
+    Return ``(changes, next cursor, more)`` for the marks of ``subject_ids``
+    written after ``cursor``; each change is ``[student, subject, date, present]``.
+    """
+    records = AttendanceRecord.objects.filter(subject_id__in=subject_ids)
+    if cursor:
+        updated_at, pk = decode_cursor(cursor)
+        records = records.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    rows = list(
+        records.order_by('updated_at', 'pk')
+        .values_list('pk', 'updated_at', 'student_id', 'subject_id', 'date', 'present')[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    horizon = timezone.now() - SYNC_CURSOR_LAG
+    settled = [row for row in rows if row[1] <= horizon]
+    if more:
+        # A full page moves on regardless so a burst of writes cannot stall the client
+        settled = rows
+    next_cursor = encode_cursor(settled[-1][1], settled[-1][0]) if settled else cursor
+    changes = [[student_id, subject_id, on_date.isoformat(), present]
+               for _, _, student_id, subject_id, on_date, present in rows]
+    return changes, next_cursor, more
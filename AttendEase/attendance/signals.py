@@ -1,15 +1,236 @@
 # signals.py
 
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Profile
-from django.contrib.auth.models import User
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+from . import audit, avatars, counters, fragments, roles
+from .bitmaps import build_sessions
+from .models import Attendance, AttendanceRecord, Faculty, Student, Subject, UserProfile
+from .summary import PRESENCE_FIELDS, apply_deltas, user_ids_for
+
+
+# ========================================= Loaded Marks =========================================
+# The receivers below compare a mark with the student, subject, day and
+# presence it was loaded (or last saved) with. One snapshot serves them all;
+# it is refreshed by remember_saved_mark, connected after them.
+
+def _snapshot(instance):
+    values = instance.__dict__
+    # Deferred fields are not loaded
+    return (values.get('student_id'), values.get('subject_id'), values.get('date'),
+            values.get(PRESENCE_FIELDS[type(instance)]))
+
+
+@receiver(post_init, sender=Attendance)
+@receiver(post_init, sender=AttendanceRecord)
+def remember_loaded_mark(sender, instance, **kwargs):
+    instance._loaded_mark = _snapshot(instance)
+
+
+# ========================================= Attendance Summary =========================================
+# Saves apply the difference from the loaded mark to AttendanceSummary
+# without re-reading the row.
+
+def _summary_key(instance):
+    model = type(instance)
+    if model is AttendanceRecord and AttendanceRecord.student.is_cached(instance):
+        user_id = instance.student.user_id
+    else:
+        user_id = user_ids_for(model, [instance.student_id]).get(instance.student_id)
+    return user_id, instance.subject_id
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=AttendanceRecord)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    present = int(getattr(instance, PRESENCE_FIELDS[sender]))
+    old_student_id, old_subject_id, _, was_present = instance._loaded_mark
+
+    if created:
+        user_id, subject_id = _summary_key(instance)
+        apply_deltas(subject_id, {user_id: (1, present)})
+    elif (old_student_id, old_subject_id) != (instance.student_id, instance.subject_id):
+        # Moved to another student or subject: take the mark off the old counters
+        old_user_id = user_ids_for(sender, [old_student_id]).get(old_student_id)
+        apply_deltas(old_subject_id, {old_user_id: (-1, -int(bool(was_present)))})
+        user_id, subject_id = _summary_key(instance)
+        apply_deltas(subject_id, {user_id: (1, present)})
+    elif was_present is not None and present != int(was_present):
+        user_id, subject_id = _summary_key(instance)
+        apply_deltas(subject_id, {user_id: (0, present - int(was_present))})
+
+
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=AttendanceRecord)
+def update_summary_on_delete(sender, instance, **kwargs):
+    user_id, subject_id = _summary_key(instance)
+    apply_deltas(subject_id, {user_id: (-1, -int(getattr(instance, PRESENCE_FIELDS[sender])))})
+
+
+# ========================================= Session Bitmaps =========================================
+# Rows saved or deleted one at a time rebuild their class session (and with
+# it the calendar month, see bitmaps.build_sessions); services.mark_roster
+# rebuilds the sessions of its bulk writes itself.
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def rebuild_session(sender, instance, raw=False, **kwargs):
+    if raw:
+        # Fixtures: run `manage.py build_attendance_sessions` once loaded
+        return
+    build_sessions(instance.subject_id, [instance.date])
+    _, subject_id, day, _ = instance._loaded_mark
+    if day is not None and (subject_id, day) != (instance.subject_id, instance.date):
+        build_sessions(subject_id, [day])
+
+
+# ========================================= Attendance Change Log =========================================
+# Rows saved or deleted one at a time (admin, shell, fixtures) are logged here;
+# services.mark_roster logs its bulk writes itself.
+
+@receiver(post_save, sender=AttendanceRecord)
+def log_saved_mark(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    student_id, subject_id, day, was_present = instance._loaded_mark
+    if created:
+        audit.log_changes([(instance.student_id, instance.subject_id, instance.date, None, instance.present)])
+    elif (student_id, subject_id, day) != (instance.student_id, instance.subject_id, instance.date):
+        # Moved to another student, subject or day: the old mark is gone
+        audit.log_changes([(student_id, subject_id, day, was_present, None),
+                           (instance.student_id, instance.subject_id, instance.date, None, instance.present)])
+    elif was_present != instance.present:
+        audit.log_changes([(student_id, subject_id, day, was_present, instance.present)])
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def log_deleted_mark(sender, instance, **kwargs):
+    audit.log_changes([(instance.student_id, instance.subject_id, instance.date, instance.present, None)])
+
+
+# Last of the mark receivers: the next save compares against this one
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=AttendanceRecord)
+def remember_saved_mark(sender, instance, **kwargs):
+    remember_loaded_mark(sender, instance)
+
+
+# ========================================= Reporting Dashboard Counters =========================================
+
+def update_counter_on_save(sender, instance, created, raw=False, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
-        
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+        counters.bump(sender, 1)
+
+
+def update_counter_on_delete(sender, instance, **kwargs):
+    counters.bump(sender, -1)
+
+
+for _model in counters.COUNTED_MODELS.values():
+    post_save.connect(update_counter_on_save, sender=_model, dispatch_uid=f'counter_save_{_model.__name__}')
+    post_delete.connect(update_counter_on_delete, sender=_model, dispatch_uid=f'counter_delete_{_model.__name__}')
+
+
+# ========================================= Dashboard Fragments =========================================
+# A saved or deleted row bumps every entity it appeared in before and after
+# the change (see fragments.py); attendance is bumped in summary.apply_deltas.
+
+def _fragment_entities(instance):
+    values = instance.__dict__
+    if isinstance(instance, Student):
+        entities = {('table', 'students'), ('class', values.get('class_name'))}
+    elif isinstance(instance, Subject):
+        entities = {('table', 'subjects'), ('subject', instance.pk), ('class', values.get('student_class')),
+                    ('faculty', values.get('faculty_id'))}
+    else:
+        # Subject rows show their faculty's name
+        entities = {('table', 'faculties'), ('table', 'subjects')}
+    # Unsaved rows and deferred fields
+    return {entity for entity in entities if entity[1] is not None}
+
+
+@receiver(post_init, sender=Student)
+@receiver(post_init, sender=Subject)
+def remember_fragment_entities(sender, instance, **kwargs):
+    instance._fragment_entities = _fragment_entities(instance)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Faculty)
+def bump_fragment_versions(sender, instance, **kwargs):
+    entities = _fragment_entities(instance)
+    fragments.bump(*entities | getattr(instance, '_fragment_entities', set()))
+    instance._fragment_entities = entities
+
+
+# ========================================= Role Cache =========================================
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_role_on_profile_change(sender, instance, **kwargs):
+    roles.invalidate([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_role_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        roles.invalidate([instance.pk])
+    elif pk_set:
+        roles.invalidate(pk_set)
+    else:
+        # group.user_set.clear(): find the members before they are removed
+        roles.invalidate(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_role_on_group_rename(sender, instance, created=False, **kwargs):
+    if not created:
+        roles.invalidate(instance.user_set.values_list('pk', flat=True))
+
+
+# ========================================= Avatar Thumbnails =========================================
+# Thumbnails of a new upload are rendered in the background (see avatars.py);
+# the old ones stop being used as soon as the avatar changes.
+
+@receiver(post_init, sender=Student)
+@receiver(post_init, sender=Faculty)
+def remember_avatar(sender, instance, **kwargs):
+    # Not loaded when the queryset deferred it
+    instance._avatar_name = instance.__dict__.get('avatar')
+
+
+def _avatar_changed(instance):
+    if 'avatar' not in instance.__dict__:
+        return False
+    avatar = instance.avatar
+    if not avatar.name or avatar.name == type(instance).avatar.field.default:
+        return False
+    # A fresh upload is not committed to storage until the field's pre_save
+    return not avatar._committed or avatar.name != instance._avatar_name
+
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Faculty)
+def reset_avatar_thumbnail(sender, instance, raw=False, **kwargs):
+    instance._avatar_changed = not raw and _avatar_changed(instance)
+    if instance._avatar_changed:
+        instance.avatar_thumb = ''
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Faculty)
+def schedule_avatar_thumbnail(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_avatar_changed', False):
+        kind = 'student' if sender is Student else 'faculty'
+        avatars.schedule(kind, instance.pk, instance.avatar.name)
+    instance._avatar_name = instance.avatar.name if 'avatar' in instance.__dict__ else None
@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from . import fragments
+from .models import Attendance, AttendanceRecord, AttendanceSummary, Student
+
+
+# ========================================= Attendance Summary Maintenance =========================================
+
+# Boolean column holding the presence flag for each attendance model
+PRESENCE_FIELDS = {
+    Attendance: 'status',
+    AttendanceRecord: 'present',
+}
+
+
+def user_ids_for(model, student_ids):
+    """Map the ``student_id`` values of ``model`` rows to ``User`` ids."""
+    student_ids = set(student_ids)
+    if model is Attendance:
+        return {student_id: student_id for student_id in student_ids}
+    return dict(Student.objects.filter(pk__in=student_ids).values_list('pk', 'user_id'))
+
+
+def apply_deltas(subject_id, deltas):
+    """
+    Add ``(delivered, attended)`` deltas, keyed by ``User`` id, to the summary
+    rows of one subject. Costs one INSERT plus one UPDATE per distinct delta,
+    whatever the number of students.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+
+    # Only new marks can need a new summary row; decrements never create one
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(student_id=user_id, subject_id=subject_id)
+         for user_id, (delivered, _) in deltas.items() if delivered > 0],
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    for (delivered, attended), user_ids in by_delta.items():
+        AttendanceSummary.objects.filter(subject_id=subject_id, student_id__in=user_ids).update(
+            delivered=F('delivered') + delivered,
+            attended=F('attended') + attended,
+        )
+    # Cached dashboards show these counters
+    fragments.bump(('subject', subject_id))
+
+
+def apply_roster_deltas(model, subject_id, roster, previous):
+    """
+    Update the summary after a bulk roster write. ``roster`` maps student ids
+    to the new presence flag and ``previous`` maps the ids that already had a
+    row to their old flag.
+    """
+    user_ids = user_ids_for(model, roster)
+    deltas = {}
+    for student_id, present in roster.items():
+        if student_id in previous:
+            deltas[user_ids[student_id]] = (0, int(present) - int(previous[student_id]))
+        else:
+            deltas[user_ids[student_id]] = (1, int(present))
+    apply_deltas(subject_id, deltas)
+
+
+# ========================================= Rebuild & Drift Check =========================================
+
+def compute_counters(apps=global_apps):
+    """Aggregate both attendance tables into ``{(user_id, subject_id): (delivered, attended)}``."""
+    attendance_model = apps.get_model('attendance', 'Attendance')
+    record_model = apps.get_model('attendance', 'AttendanceRecord')
+
+    delivered, attended = Counter(), Counter()
+    sources = (
+        (attendance_model, 'student_id', 'status'),
+        (record_model, 'student__user_id', 'present'),
+    )
+    for model, user_field, flag in sources:
+        rows = model.objects.values_list(user_field, 'subject_id').annotate(
+            delivered=Count('pk'), attended=Count('pk', filter=Q(**{flag: True})),
+        ).order_by()
+        for user_id, subject_id, row_delivered, row_attended in rows:
+            delivered[user_id, subject_id] += row_delivered
+            attended[user_id, subject_id] += row_attended
+    return {key: (delivered[key], attended[key]) for key in delivered}
+
+
+def rebuild_summary(apps=global_apps, batch_size=1000):
+    """Recreate every summary row from the raw attendance tables. Returns the row count."""
+    summary_model = apps.get_model('attendance', 'AttendanceSummary')
+    counters = compute_counters(apps)
+    with transaction.atomic():
+        subject_ids = set(summary_model.objects.values_list('subject_id', flat=True).distinct())
+        summary_model.objects.all().delete()
+        summary_model.objects.bulk_create(
+            (summary_model(student_id=user_id, subject_id=subject_id, delivered=delivered, attended=attended)
+             for (user_id, subject_id), (delivered, attended) in counters.items()),
+            batch_size=batch_size,
+        )
+        subject_ids.update(subject_id for _, subject_id in counters)
+        fragments.bump(*[('subject', subject_id) for subject_id in subject_ids])
+    return len(counters)
+
+
+def find_drift():
+    """Return ``{(user_id, subject_id): (stored, expected)}`` for every summary row that is out of date."""
+    expected = compute_counters()
+    stored = {
+        (user_id, subject_id): (delivered, attended)
+        for user_id, subject_id, delivered, attended in AttendanceSummary.objects.values_list(
+            'student_id', 'subject_id', 'delivered', 'attended')
+    }
+    return {
+        key: (stored.get(key, (0, 0)), expected.get(key, (0, 0)))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, (0, 0)) != expected.get(key, (0, 0))
+    }
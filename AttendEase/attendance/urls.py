@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path 
-from .import views
+from .import api, views
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -35,9 +35,20 @@ urlpatterns = [
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('faculty_dashboard/', views.faculty_dashboard, name='faculty_dashboard'),
     path('student_dashboard/', views.student_dashboard, name='student_dashboard'),
+    path('performance/', views.student_performance, name='student_performance'),
     path('edit_attendance/', views.edit_attendance, name='edit_attendance'),
     path('reporting/', views.reporting_dashboard, name='reporting_dashboard'),
+    path('reporting/<str:table>/', views.reporting_rows, name='reporting_rows'),
     path('daywise/', views.daywise_attendance_view, name='daywise_attendance'),
+    path('defaulters/', views.defaulters_view, name='defaulters'),
+    path('calendar/', views.attendance_calendar, name='attendance_calendar'),
+    path('history/', views.attendance_history, name='attendance_history'),
+    path('export/', views.export_attendance, name='export_attendance'),
+    path('import/', views.import_roster_view, name='import_roster'),
+    path('api/subjects/<int:subject_id>/attendance/', api.subject_attendance, name='api_subject_attendance'),
+    path('api/sync/', api.sync_attendance, name='api_sync'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('thumbs/<str:name>', views.avatar_thumbnail, name='avatar_thumbnail'),
 
     
 
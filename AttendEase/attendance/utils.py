@@ -1,6 +1,8 @@
 from functools import wraps
 from django.shortcuts import redirect
 
+from .roles import get_role
+
 def role_required(allowed_roles):
     def decorator(view_func):
         @wraps(view_func)
@@ -8,10 +10,21 @@ def role_required(allowed_roles):
             if not request.user.is_authenticated:
                 return redirect('login')
 
-            if hasattr(request.user, 'userprofile'):
-                user_role = request.user.userprofile.role
-                if user_role in allowed_roles:
-                    return view_func(request, *args, **kwargs)
+            if get_role(request.user) in allowed_roles:
+                return view_func(request, *args, **kwargs)
             return redirect('login')  # or redirect to an "unauthorized" page
         return wrapper
     return decorator
+
+
+def keyset_page(queryset, after=None, size=50):
+    """
+    Return one page of ``queryset`` ordered by primary key, starting after the
+    ``after`` cursor, plus the cursor for the next page (``None`` on the last one).
+    """
+    queryset = queryset.order_by('pk')
+    if after:
+        queryset = queryset.filter(pk__gt=after)
+    rows = list(queryset[:size + 1])
+    next_cursor = rows[size - 1].pk if len(rows) > size else None
+    return rows[:size], next_cursor
@@ -1,3 +1,7 @@
+import csv
+import io
+from datetime import date, timedelta
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User, Group
 from django.contrib.auth import authenticate, login, logout
@@ -6,11 +10,34 @@ from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.contrib.auth.password_validation import validate_password
 from django.forms import modelformset_factory
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
-from .forms import StudentForm, FacultyForm, AttendanceForm, SubjectForm
-from .models import Student, Faculty, AttendanceRecord, Subject, Attendance
-from .utils import role_required
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.contrib.admin.views.decorators import staff_member_required
+from django.template.loader import render_to_string
+from .forms import StudentForm, FacultyForm, AttendanceForm, SubjectForm, LoadedRowsFormSet
+from .models import Student, Faculty, AttendanceRecord, Subject, Attendance, Defaulter, DefaulterRun
+from .analytics import class_report, student_report
+from .audit import change_history
+from .avatars import THUMBNAIL_NAME, thumbnail_path
+from .counters import get_counts
+from .fragments import cached, render_fragment, stats as fragment_stats
+from .heatmap import MAX_MONTHS, daily_counts, month_start, months_between, next_month
+from .metrics import prometheus_text, summarize
+from .roster_import import IMPORT_COLUMNS, IMPORT_UPLOAD_MAX_ROWS, import_roster
+from .exports import EXPORT_SOURCES, csv_stream, export_rows, xlsx_stream
+from .services import mark_roster, presence_by_student
+from .roles import user_access
+from .utils import keyset_page, role_required
 
 # Home Page
 def index(request):
@@ -80,6 +107,8 @@ def register_faculty(request):
                 )
                 group, _ = Group.objects.get_or_create(name='Faculty')
                 user.groups.add(group)
+                user.userprofile.role = 'faculty'
+                user.userprofile.save()
 
                 if form.is_valid():
                     faculty = form.save(commit=False)
@@ -154,11 +183,12 @@ def user_login(request):
 
         if user:
             login(request, user)
+            groups = user_access(user)[1]
             if user.is_staff:
                 return redirect('admin_dashboard')
-            elif user.groups.filter(name='Faculty').exists():
+            elif 'Faculty' in groups:
                 return redirect('faculty_dashboard')
-            elif user.groups.filter(name='Student').exists():
+            elif 'Student' in groups:
                 return redirect('student_dashboard')
         else:
             messages.error(request, 'Invalid username or password.')
@@ -189,35 +219,24 @@ def faculty_dashboard(request):
     except Faculty.DoesNotExist:
         return redirect('login')  # or show error page
 
-    subjects = Subject.objects.filter(faculty=faculty)
-
     selected_subject_id = request.GET.get('subject')
     selected_date = request.GET.get('date', date.today().strftime('%Y-%m-%d'))
-    attendance_data = []
-
-    if selected_subject_id:
-        attendance_data = Attendance.objects.filter(
-            subject_id=selected_subject_id,
-            date=selected_date
-        ).select_related('student__user')
 
     if request.method == 'POST':
         student_ids = request.POST.getlist('student_ids')
-        for student_id in student_ids:
-            present = f'present_{student_id}' in request.POST
-            Attendance.objects.update_or_create(
-                student_id=student_id,
-                subject_id=selected_subject_id,
-                date=selected_date,
-                defaults={'present': present}
-            )
+        mark_roster(selected_subject_id, selected_date, {
+            student_id: f'present_{student_id}' in request.POST
+            for student_id in student_ids
+        }, changed_by=user, source='mark')
         return redirect('faculty_dashboard')  # or with GET params to retain view
 
     context = {
-        'subjects': subjects,
+        'subject_options': render_fragment(
+            'faculty_subject_options.html', [('faculty', faculty.pk)], selected_subject_id,
+            lambda: {'subjects': Subject.objects.filter(faculty=faculty), 'selected_subject': selected_subject_id},
+        ),
         'selected_subject': selected_subject_id,
         'selected_date': selected_date,
-        'attendance_data': attendance_data,
     }
     return render(request, 'faculty_dashboard.html', context)
 from django.contrib.auth.decorators import login_required
@@ -235,32 +254,47 @@ def student_dashboard(request):
     semester = request.GET.get('semester', '3')
     class_name = student.class_name
 
-    # Fetch subjects for the class, academic year, and semester
     subjects = Subject.objects.filter(
         academic_year=academic_year,
         semester=semester,
         student_class=class_name
     )
-
-    course_data = []
-    for idx, subject in enumerate(subjects, start=1):
-        attendance_records = Attendance.objects.filter(student=student, subject=subject)
-        delivered = attendance_records.count()
-        attended = attendance_records.filter(status='Present').count()
-        percent = round((attended / delivered) * 100, 2) if delivered > 0 else 0
-
-        course_data.append({
-            "sr_no": idx,
-            "course_name": subject.course_name,
-            "short_name": subject.short_name,
-            "course_code": subject.course_code,
-            "attended": attended,
-            "delivered": delivered,
-            "percent": percent,
-        })
+    subject_ids = list(subjects.order_by('id').values_list('id', flat=True))
+
+    def course_context():
+        # This student's precomputed counters from AttendanceSummary
+        rows = subjects.annotate(
+            own_summary=FilteredRelation(
+                'attendance_summaries', condition=Q(attendance_summaries__student=request.user)
+            ),
+            delivered=Coalesce(F('own_summary__delivered'), 0),
+            attended=Coalesce(F('own_summary__attended'), 0),
+        ).order_by('id')
+
+        course_data = []
+        for idx, subject in enumerate(rows, start=1):
+            delivered = subject.delivered
+            attended = subject.attended
+            percent = round((attended / delivered) * 100, 2) if delivered > 0 else 0
+
+            course_data.append({
+                "sr_no": idx,
+                "course_name": subject.course_name,
+                "short_name": subject.short_name,
+                "course_code": subject.course_code,
+                "attended": attended,
+                "delivered": delivered,
+                "percent": percent,
+            })
+        return {"course_data": course_data}
 
     context = {
-        "course_data": course_data,
+        "course_rows": render_fragment(
+            'student_course_rows.html',
+            [('class', class_name)] + [('subject', pk) for pk in subject_ids],
+            (request.user.pk, academic_year, semester, class_name),
+            course_context,
+        ),
         "academic_year": academic_year,
         "semester": semester,
         "class_name": class_name,
@@ -270,21 +304,116 @@ def student_dashboard(request):
     return render(request, 'student_dashboard.html', context)
 
 
+@login_required
+def student_performance(request):
+    try:
+        student = Student.objects.get(user=request.user)
+    except Student.DoesNotExist:
+        return render(request, 'student_not_found.html', status=404)
+
+    academic_year = request.GET.get('academic_year', '2024-2025')
+    semester = request.GET.get('semester', '3')
+    subjects = list(Subject.objects.filter(
+        academic_year=academic_year,
+        semester=semester,
+        student_class=student.class_name,
+    ).order_by('id'))
+
+    context = {
+        'student': student,
+        'academic_year': academic_year,
+        'semester': semester,
+        **student_report(student, subjects),
+    }
+    return render(request, 'student_performance.html', context)
+
+
 
 #----------------------------------------------------------------Reporting Dashboard----------------------------------------------------------
+REPORTING_PAGE_SIZE = 50
+
+# table name -> (queryset factory, searchable fields, row fragment template)
+REPORTING_TABLES = {
+    'students': (
+        lambda: Student.objects.select_related('user'),
+        ('first_name', 'last_name', 'roll_no', 'email', 'class_name', 'user__username'),
+        'reporting_student_rows.html',
+    ),
+    'subjects': (
+        lambda: Subject.objects.select_related('faculty'),
+        ('course_name', 'course_code', 'short_name', 'faculty__first_name', 'faculty__last_name'),
+        'reporting_subject_rows.html',
+    ),
+    'faculties': (
+        lambda: Faculty.objects.all(),
+        ('first_name', 'last_name', 'username', 'email', 'department'),
+        'reporting_faculty_rows.html',
+    ),
+}
+
+
+def reporting_page(table, after=None, search=''):
+    queryset, search_fields, template = REPORTING_TABLES[table]
+    queryset = queryset()
+    if search:
+        query = Q()
+        for field in search_fields:
+            query |= Q(**{f'{field}__icontains': search})
+        queryset = queryset.filter(query)
+    rows, next_cursor = keyset_page(queryset, after, REPORTING_PAGE_SIZE)
+    return rows, next_cursor, template
+
+
+@staff_member_required
 def reporting_dashboard(request):
+    counts = get_counts()
     context = {
-        'total_attendance_records': Attendance.objects.count(),
-        'total_students': Student.objects.count(),
-        'total_subjects': Subject.objects.count(),
-        'total_faculties': Faculty.objects.count(),
-        'students': Student.objects.all(),
-        'subjects': Subject.objects.all(),
-        'faculties': Faculty.objects.all()
+        'total_attendance_records': counts['attendance'] + counts['legacy_attendance'],
+        'total_students': counts['students'],
+        'total_subjects': counts['subjects'],
+        'total_faculties': counts['faculties'],
     }
+    # Only the first page of each table is rendered; the rest is fetched from
+    # reporting_rows as the user scrolls or searches
+    for table in REPORTING_TABLES:
+        def first_page(table=table):
+            rows, next_cursor, template = reporting_page(table)
+            return render_to_string(template, {'rows': rows}), next_cursor
+        context[f'{table}_rows'], context[f'{table}_next'] = cached(
+            f'reporting_{table}', [('table', table)], None, first_page,
+        )
+
+    context['class_names'] = cached('class_names', [('table', 'students')], None, lambda: list(
+        Student.objects.order_by('class_name').values_list('class_name', flat=True).distinct()
+    ))
+    class_name = request.GET.get('class', '').strip()
+    if class_name:
+        subject_ids = Subject.objects.filter(student_class=class_name).order_by('pk').values_list('pk', flat=True)
+        context['selected_class'] = class_name
+        context['class_report'] = render_fragment(
+            'reporting_class_report.html',
+            [('class', class_name)] + [('subject', pk) for pk in subject_ids],
+            class_name,
+            lambda: {'class_report': class_report(class_name)},
+        )
     return render(request, 'reporting_dashboard.html', context)
 
 
+@staff_member_required
+def reporting_rows(request, table):
+    if table not in REPORTING_TABLES:
+        raise Http404("Unknown table")
+    after = request.GET.get('after')
+    if after and not after.isdigit():
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    rows, next_cursor, template = reporting_page(table, after, request.GET.get('q', '').strip())
+    return JsonResponse({
+        'html': render_to_string(template, {'rows': rows}, request=request),
+        'next': next_cursor,
+    })
+
+
 
 
 
@@ -296,6 +425,72 @@ def reporting_dashboard(request):
 
 
 
+# ================================================ Export Attendance ========================================================
+@staff_member_required
+def export_attendance(request):
+    export_format = request.GET.get('format', 'csv')
+    source = request.GET.get('source', 'records')
+    if export_format not in ('csv', 'xlsx') or source not in EXPORT_SOURCES:
+        return HttpResponseBadRequest("Unknown export format or source.")
+
+    # Validate up front: errors raised once streaming has started cannot become a 400
+    subject = request.GET.get('subject') or None
+    try:
+        start, end = (date.fromisoformat(request.GET[key]) if request.GET.get(key) else None
+                      for key in ('start', 'end'))
+    except ValueError:
+        return HttpResponseBadRequest("Dates must be YYYY-MM-DD.")
+    if subject and not subject.isdigit():
+        return HttpResponseBadRequest("Invalid subject.")
+
+    rows = export_rows(
+        source=source,
+        subject=subject,
+        class_name=request.GET.get('class') or None,
+        start=start,
+        end=end,
+        semester=request.GET.get('semester') or None,
+    )
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_stream(rows), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(
+            xlsx_stream(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    response['Content-Disposition'] = f'attachment; filename="attendance.{export_format}"'
+    return response
+
+
+# ================================================ Import Roster ========================================================
+@staff_member_required
+def import_roster_view(request):
+    max_rows = getattr(settings, 'ATTENDANCE_IMPORT_UPLOAD_MAX_ROWS', IMPORT_UPLOAD_MAX_ROWS)
+    context = {'kinds': sorted(IMPORT_COLUMNS), 'columns': IMPORT_COLUMNS, 'max_rows': max_rows}
+    if request.method == 'POST':
+        kind = request.POST.get('kind')
+        upload = request.FILES.get('csv_file')
+        if kind not in IMPORT_COLUMNS or not upload:
+            messages.error(request, "Choose what to import and a CSV file.")
+        else:
+            csv_file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                # Every password is hashed while the request waits
+                rows = sum(1 for _ in csv.reader(csv_file)) - 1
+                csv_file.seek(0)
+                if rows > max_rows:
+                    messages.error(request, f"Upload at most {max_rows} rows at a time; import larger files with "
+                                            f"`manage.py import_roster`.")
+                else:
+                    # Hash passwords in this process: a request must not start a process pool
+                    result = import_roster(csv_file, kind, workers=1)
+                    messages.success(request, f"Imported {result.created} {kind}.")
+                    context.update({'kind': kind, 'errors': result.errors})
+            except (UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f"Could not read {upload.name}: {e}. Upload a UTF-8 CSV file.")
+    return render(request, 'import_roster.html', context)
+
+
 # ================================================Mark Attendance========================================================
 # views.py
 
@@ -312,44 +507,58 @@ def mark_attendance(request):
         if form.is_valid():
             # Get the cleaned data
             subject = form.cleaned_data['subject']
-            students = form.cleaned_data['students']  # Could be a multiple choice field
+            students = form.cleaned_data['students']  # Student ids from the subject's roster
             date_selected = form.cleaned_data['date']
             
-            for student in students:
-                AttendanceRecord.objects.create(
-                    student=student,
-                    subject=subject,
-                    date=date_selected,
-                    present=True  # You can toggle based on form input
-                )
+            mark_roster(
+                subject.pk,
+                date_selected,
+                {student_id: True for student_id in students},  # You can toggle based on form input
+                changed_by=request.user,
+                source='mark',
+            )
 
             messages.success(request, "Attendance marked successfully!")
             return redirect('attendance_success')  # Define this URL in your project
 
     else:
-        form = AttendanceForm()
+        form = AttendanceForm(initial={'subject': request.GET.get('subject')})
 
     return render(request, 'mark_attendance.html', {'form': form})
 # =========================================================Edit Attendance===========================================================
 @login_required
 @role_required(['faculty'])
 def edit_attendance(request):
-    AttendanceFormSet = modelformset_factory(AttendanceRecord, fields=('present',), extra=0)
-    subjects = Subject.objects.filter(faculty__user=request.user)
+    AttendanceFormSet = modelformset_factory(AttendanceRecord, formset=LoadedRowsFormSet, fields=('present',), extra=0)
+    subjects = Subject.objects.filter(faculty__username=request.user.username)
 
     selected_subject = request.GET.get('subject')
     selected_date = request.GET.get('date')
-    records = AttendanceRecord.objects.none()
+    subject, records = None, AttendanceRecord.objects.none()
 
     if selected_subject and selected_date:
-        records = AttendanceRecord.objects.filter(subject_id=selected_subject, date=selected_date)
+        # Only the faculty member's own subjects can be edited
+        if not selected_subject.isdigit():
+            raise Http404("No such subject")
+        subject = get_object_or_404(subjects, pk=selected_subject)
+        try:
+            on_date = date.fromisoformat(selected_date)
+        except ValueError:
+            return HttpResponseBadRequest("Invalid date.")
+        records = AttendanceRecord.objects.filter(subject=subject, date=on_date).select_related(
+            'student__user'
+        ).order_by('student__roll_no')
 
     formset = AttendanceFormSet(queryset=records)
 
-    if request.method == 'POST':
+    if request.method == 'POST' and subject is not None:
         formset = AttendanceFormSet(request.POST, queryset=records)
         if formset.is_valid():
-            formset.save()
+            # One roster write (and one change-log insert) instead of a save per row
+            mark_roster(subject.pk, on_date, {
+                form.instance.student_id: form.cleaned_data['present']
+                for form in formset.forms if form.has_changed()
+            }, changed_by=request.user, source='edit')
             return redirect('attendance_success')
 
     return render(request, 'edit_attendance.html', {
@@ -365,22 +574,26 @@ from django.shortcuts import render
 from .models import AttendanceRecord, Student
 from datetime import date
 
+DAYWISE_PAGE_SIZE = 100
+
 def daywise_attendance_view(request):
     selected_date = request.GET.get('date')  # Get date from query parameter
     if selected_date:
-        attendance_records = AttendanceRecord.objects.filter(date=selected_date)
-        student_status = {}
-
-        for student in Student.objects.all():
-            record = attendance_records.filter(student=student).first()
-            if record:
-                student_status[student] = 'Present' if record.present else 'Absent'
-            else:
-                student_status[student] = 'Absent'  # If no record, assume absent
+        # Page through the roster and fetch the day's records for that page only,
+        # joined to the students in memory by primary key
+        page_obj = Paginator(Student.objects.order_by('roll_no'), DAYWISE_PAGE_SIZE).get_page(request.GET.get('page'))
+        students = list(page_obj)
+        present_by_student = presence_by_student(selected_date, student_ids=[s.pk for s in students])
+        student_status = {
+            # If no record, assume absent
+            student: 'Present' if present_by_student.get(student.pk) else 'Absent'
+            for student in students
+        }
 
         context = {
             'student_status': student_status,
-            'selected_date': selected_date
+            'selected_date': selected_date,
+            'page_obj': page_obj,
         }
     else:
         context = {
@@ -388,4 +601,130 @@ def daywise_attendance_view(request):
             'selected_date': None
         }
 
-    return render(request, 'daywise_attendance.html', context)
\ No newline at end of file
+    return render(request, 'daywise_attendance.html', context)
+
+
+# =========================================================Defaulters===========================================================
+DEFAULTERS_PAGE_SIZE = 100
+
+
+@login_required
+@role_required(['admin', 'faculty'])
+def defaulters_view(request):
+    # Read-only: the list is kept current by `manage.py compute_defaulters`
+    class_name = request.GET.get('class', '').strip()
+    subject_id = request.GET.get('subject', '')
+    defaulters = Defaulter.objects.select_related('student', 'subject').order_by('percent', 'student__roll_no')
+    if class_name:
+        defaulters = defaulters.filter(subject__student_class=class_name)
+    if subject_id.isdigit():
+        defaulters = defaulters.filter(subject_id=subject_id)
+
+    context = {
+        'page_obj': Paginator(defaulters, DEFAULTERS_PAGE_SIZE).get_page(request.GET.get('page')),
+        'last_run': DefaulterRun.objects.order_by('-pk').first(),
+        'class_name': class_name,
+        'subject_id': subject_id,
+    }
+    return render(request, 'defaulters.html', context)
+
+
+# =========================================================Attendance Calendar===========================================================
+# GET calendar/?class=CSE-A&subject=3&academic_year=2024-2025&semester=3&start=2024-08&end=2024-12
+#   -> {"start": "2024-08-01", "end": "2024-12-31",
+#       "subjects": [{"id": 3, "course_code": ..., "short_name": ..., "student_class": ...}],
+#       "days": {"3": [["2024-08-01", marked, present], ...]}}
+# start and end are months (default: this month); only days with marks are listed.
+
+def _month(value, default):
+    return date.fromisoformat(f'{value}-01') if value else default
+
+
+@role_required(['admin', 'faculty'])
+def attendance_calendar(request):
+    class_name = request.GET.get('class', '').strip()
+    subject_ids = request.GET.getlist('subject')
+    if not class_name and not subject_ids:
+        return JsonResponse({'error': 'Choose a class or subjects'}, status=400)
+    if not all(pk.isdigit() for pk in subject_ids):
+        return JsonResponse({'error': 'Invalid subject'}, status=400)
+    try:
+        first = _month(request.GET.get('start'), month_start(timezone.localdate()))
+        last = _month(request.GET.get('end'), first)
+    except ValueError:
+        return JsonResponse({'error': 'Months are YYYY-MM'}, status=400)
+    if not 0 < len(months_between(first, last)) <= MAX_MONTHS:
+        return JsonResponse({'error': f'Choose between 1 and {MAX_MONTHS} months'}, status=400)
+
+    subjects = Subject.objects.order_by('student_class', 'course_code')
+    if class_name:
+        subjects = subjects.filter(student_class=class_name)
+    if subject_ids:
+        subjects = subjects.filter(pk__in=subject_ids)
+    for field in ('academic_year', 'semester'):
+        if request.GET.get(field):
+            subjects = subjects.filter(**{field: request.GET[field]})
+    subjects = list(subjects.values('id', 'course_code', 'short_name', 'student_class'))
+
+    counts = daily_counts([subject['id'] for subject in subjects], first, last)
+    return JsonResponse({
+        'start': first.isoformat(),
+        'end': (next_month(last) - timedelta(days=1)).isoformat(),
+        'subjects': subjects,
+        'days': {
+            str(subject['id']): [[day.isoformat(), marked, present]
+                                 for day, (marked, present) in sorted(counts[subject['id']].items())]
+            for subject in subjects
+        },
+    })
+
+
+# =========================================================Attendance History===========================================================
+# GET history/?student=12&subject=3
+#   -> {"changes": [{"date": "2024-08-01", "previous": true, "present": false,
+#                    "changed_at": "...", "source": "edit", "changed_by": "faculty1"}, ...]}
+# Newest first; previous is null for a new mark, present is null for a deleted one.
+
+@role_required(['admin', 'faculty'])
+def attendance_history(request):
+    student_id, subject_id = request.GET.get('student', ''), request.GET.get('subject', '')
+    if not (student_id.isdigit() and subject_id.isdigit()):
+        return JsonResponse({'error': 'Choose a student and a subject'}, status=400)
+    return JsonResponse({'changes': [
+        {'date': change['date'].isoformat(), 'previous': change['previous'], 'present': change['present'],
+         'changed_at': change['changed_at'].isoformat(), 'source': change['source'],
+         'changed_by': change['changed_by__username']}
+        for change in change_history(int(student_id), int(subject_id))
+    ]})
+
+
+# =========================================================Metrics===========================================================
+def metrics_view(request):
+    # Staff, or a scraper presenting ATTENDANCE_METRICS_TOKEN as a bearer token
+    token = getattr(settings, 'ATTENDANCE_METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and constant_time_compare(bearer, token))):
+        return HttpResponse(status=403)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'summary': summarize(), 'fragments': fragment_stats()})
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4')
+
+
+# =========================================================Avatar Thumbnails===========================================================
+def avatar_thumbnail(request, name):
+    # Thumbnail names are content hashes, so a URL's bytes never change
+    if not THUMBNAIL_NAME.match(name):
+        raise Http404("Unknown thumbnail")
+    etag = f'"{name}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            thumbnail = default_storage.open(thumbnail_path(name), 'rb')
+        except OSError:
+            raise Http404("Unknown thumbnail")
+        content_type = 'image/webp' if name.endswith('.webp') else 'image/jpeg'
+        response = FileResponse(thumbnail, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
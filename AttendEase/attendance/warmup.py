@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from django.template import engines
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+
+# ========================================= Template Warmup =========================================
+# With the cached loader each process compiles a template the first time it is
+# rendered. Compiling them all up front (AttendanceConfig.ready() when
+# ATTENDANCE_WARM_TEMPLATES is set, or `manage.py warm_templates`) moves that
+# cost from the first requests to process start.
+
+def template_names():
+    return sorted(path.relative_to(TEMPLATE_DIR).as_posix() for path in TEMPLATE_DIR.rglob('*.html'))
+
+
+def warm_templates():
+    """Compile every template of the app into the loader cache. Returns the template names."""
+    engine = engines['django']
+    names = template_names()
+    for name in names:
+        engine.get_template(name)
+    return names